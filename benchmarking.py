@@ -0,0 +1,104 @@
+"""
+Reporting helpers shared by the benchmark and simulation scripts: the
+details of the run stamped on every report, peak memory, and comparison
+of stage times against an earlier report.
+
+The scripts live in their own project directories and add this one to
+sys.path before importing it.
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+
+
+def add_report_arguments(parser, memory=True):
+    """
+    Add the --seed, --output and --compare options, and --skip-memory
+    if `memory`, to the argparse `parser`.
+    """
+    if memory:
+        parser.add_argument("--skip-memory", action="store_true",
+                            help="do not rerun each stage under tracemalloc to record peak memory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_output.json",
+                        help="file the JSON results are written to")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="earlier results file to compare stage times against")
+
+
+def run_details(**versions):
+    """
+    Return the git commit, Python version, any other `versions` given and
+    time of this run, recorded with every report so that runs from
+    different commits can be told apart.
+    """
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        **versions,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(filename, report):
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {filename}")
+
+
+def peak_memory(stage):
+    """
+    Run `stage` again under tracemalloc and return its peak allocation in bytes.
+    """
+    tracemalloc.start()
+    try:
+        stage()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def format_record(record, columns):
+    """
+    Return a line showing the fields of `record` named in `columns`, a
+    list of (key, format spec) pairs, then its time and peak memory.
+    """
+    line = " ".join(f"{record[key]:{spec}}" for key, spec in columns)
+    line += f" {record['seconds']:9.4f}s"
+    if "peak_bytes" in record:
+        line += f" {record['peak_bytes'] / 2 ** 20:9.1f} MiB"
+    return line
+
+
+def compare_results(filename, results, columns):
+    """
+    Print the ratio of each stage's time to the same stage in an earlier
+    results file, matching records on the keys in `columns` (see
+    format_record).
+    """
+    with open(filename) as f:
+        baseline = json.load(f)
+    keys = [key for key, _ in columns]
+    before = {
+        tuple(record[key] for key in keys): record["seconds"]
+        for record in baseline["results"]
+    }
+    print(f"Compared with {filename} (commit {baseline.get('commit')}):")
+    for record in results:
+        key = tuple(record[key] for key in keys)
+        if key in before and before[key] > 0:
+            line = " ".join(f"{record[key]:{spec}}" for key, spec in columns)
+            print(f"{line} {record['seconds'] / before[key]:6.2f}x")
@@ -1,7 +1,17 @@
 from ast import Or
+from collections import deque
 import itertools
+import math
 import random
 
+# Most memoized states make_random_move may count, across all frontier
+# components, before falling back to an estimate; a count rather than a
+# time limit, so a seeded game plays the same however loaded the machine
+MOVE_STATES = 5000
+
+# Largest frontier component whose mine configurations are enumerated
+MAX_COMPONENT = 64
+
 
 class Minesweeper():
     """
@@ -138,16 +148,257 @@ class Sentence():
         if cell in self.cells:
             self.cells.remove(cell)
 
+
+class BitSentence():
+    """
+    Compact sentence used by the AI's knowledge base, meaning the same
+    as a Sentence. Cell (i, j) is numbered i * width + j, and the cells
+    are the bits of `mask` counted up from the lowest cell, `offset`, so
+    the mask only spans the rows the sentence covers. Subset tests,
+    differences and marking a cell are then integer operations.
+    """
+
+    __slots__ = ("offset", "mask", "size", "count", "width")
+
+    def __init__(self, cells, count, width):
+        ids = {i * width + j for i, j in cells}
+        offset = min(ids, default=0)
+        self.offset = offset
+        self.mask = sum([1 << (cellId - offset) for cellId in ids])
+        self.size = len(ids)
+        self.count = count
+        self.width = width
+
+    @classmethod
+    def from_mask(cls, offset, mask, size, count, width):
+        sentence = cls((), count, width)
+        sentence.offset = offset
+        sentence.mask = mask
+        sentence.size = size
+        sentence.normalize()
+        return sentence
+
+    def __eq__(self, other):
+        return self.key() == other.key()
+
+    def __str__(self):
+        return f"{self.cells} = {self.count}"
+
+    def key(self):
+        """
+        Returns a (offset, mask, count) tuple equal only for equal sentences.
+        """
+        return (self.offset, self.mask, self.count)
+
+    @property
+    def cells(self):
+        return {divmod(cellId, self.width) for cellId in self.ids()}
+
+    def ids(self):
+        """
+        Yields the number of each cell in the sentence.
+        """
+        mask = self.mask
+        offset = self.offset - 1
+        while mask:
+            lowest = mask & -mask
+            yield offset + lowest.bit_length()
+            mask ^= lowest
+
+    def normalize(self):
+        """
+        Shifts the mask so that its lowest bit is the lowest cell.
+        """
+        if self.mask == 0:
+            self.offset = 0
+        elif not self.mask & 1:
+            shift = (self.mask & -self.mask).bit_length() - 1
+            self.mask >>= shift
+            self.offset += shift
+
+    def issubset(self, other):
+        """
+        Returns True if every cell of this sentence is in `other`.
+        """
+        shift = self.offset - other.offset
+        if shift < 0:
+            return self.size == 0
+        return (self.mask << shift) & ~other.mask == 0
+
+    def difference(self, other):
+        """
+        Returns the sentence over the cells of this sentence not in
+        `other`, which must be a subset of it.
+        """
+        mask = self.mask
+        if other.size > 0:
+            mask ^= other.mask << (other.offset - self.offset)
+        return BitSentence.from_mask(
+            self.offset, mask,
+            self.size - other.size, self.count - other.count, self.width
+        )
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        if self.size == self.count:
+            return self.cells
+        else:
+            return set()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        if self.count == 0:
+            return self.cells
+        else:
+            return set()
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        if self.remove_bit(cell[0] * self.width + cell[1]):
+            self.count -= 1
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        self.remove_bit(cell[0] * self.width + cell[1])
+
+    def remove_bit(self, cellId):
+        shift = cellId - self.offset
+        if shift < 0 or not (self.mask >> shift) & 1:
+            return False
+        self.mask ^= 1 << shift
+        self.size -= 1
+        if shift == 0:
+            self.normalize()
+        return True
+
+
+class KnowledgeBase():
+    """
+    Collection of sentences known to be true, with an index from each
+    cell to the sentences that mention it, so that marking a cell or
+    looking for related sentences only touches sentences sharing a cell.
+    Sentences must only be changed through the knowledge base.
+
+    The knowledge base stays compact: a sentence equal to one already
+    held is not added, and sentences left empty or duplicated by marking
+    a cell are removed. Sentences are BitSentences, and the index is
+    keyed by cell number.
+    """
+
+    def __init__(self, width):
+        self.width = width
+        self.sentences = dict()
+        self.index = dict()
+        self.keys = dict()
+        self.nextId = 0
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def __iter__(self):
+        return iter(list(self.sentences.values()))
+
+    def add(self, sentence):
+        """
+        Adds a sentence and returns its id, or None if it is empty or
+        already known.
+        """
+        key = sentence.key()
+        if sentence.size == 0 or key in self.keys:
+            return None
+        sentenceId = self.nextId
+        self.nextId += 1
+        self.sentences[sentenceId] = sentence
+        self.keys[key] = sentenceId
+        for cellId in sentence.ids():
+            self.index.setdefault(cellId, set()).add(sentenceId)
+        return sentenceId
+
+    def remove(self, sentenceId):
+        """
+        Removes the sentence with id `sentenceId`.
+        """
+        sentence = self.sentences.pop(sentenceId)
+        key = sentence.key()
+        if self.keys.get(key) == sentenceId:
+            del self.keys[key]
+        for cellId in sentence.ids():
+            ids = self.index[cellId]
+            ids.discard(sentenceId)
+            if not ids:
+                del self.index[cellId]
+
+    def get(self, sentenceId):
+        return self.sentences.get(sentenceId)
+
+    def related(self, sentence):
+        """
+        Returns the ids of the sentences sharing a cell with `sentence`.
+        """
+        ids = set()
+        for cellId in sentence.ids():
+            ids.update(self.index.get(cellId, ()))
+        return ids
+
+    def mark_mine(self, cell):
+        """
+        Marks `cell` as a mine in every sentence mentioning it and
+        returns the ids of those sentences still held.
+        """
+        return self.mark(cell, True)
+
+    def mark_safe(self, cell):
+        """
+        Marks `cell` as safe in every sentence mentioning it and
+        returns the ids of those sentences still held.
+        """
+        return self.mark(cell, False)
+
+    def mark(self, cell, mine):
+        changed = set()
+        cellId = cell[0] * self.width + cell[1]
+        for sentenceId in self.index.pop(cellId, ()):
+            sentence = self.sentences[sentenceId]
+            del self.keys[sentence.key()]
+            sentence.remove_bit(cellId)
+            if mine:
+                sentence.count -= 1
+            key = sentence.key()
+            if sentence.size == 0 or key in self.keys:
+                self.remove(sentenceId)
+            else:
+                self.keys[key] = sentenceId
+                changed.add(sentenceId)
+        return changed
+
+
+class CountLimitReached(Exception):
+    """
+    Raised when counting mine configurations needs more states than allowed.
+    """
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=8):
 
-        # Set initial height and width
+        # Set initial height, width, and number of mines
         self.height = height
         self.width = width
+        self.totalMines = mines
 
         # Keep track of which cells have been clicked on
         self.moves_made = set()
@@ -155,10 +406,17 @@ class MinesweeperAI():
         # Keep track of cells known to be safe or mines
         self.mines = set()
         self.safes = set()
-        self.allCells = self.init_all_cells()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Cells known to be safe that have not been played yet
+        self.safeMoves = set()
+
+        # Numbers of the cells not yet played or known to be safe or mines,
+        # and each cell's position in that list, or -1 once it is known
+        self.unknown = list(range(height * width))
+        self.unknownPosition = list(range(height * width))
+
+        # Sentences about the game known to be true
+        self.knowledge = KnowledgeBase(width)
 
     def mark_mine(self, cell):
         """
@@ -166,8 +424,8 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.mark_known(cell)
+        return self.knowledge.mark_mine(cell)
 
     def mark_safe(self, cell):
         """
@@ -175,8 +433,25 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        if cell not in self.moves_made:
+            self.safeMoves.add(cell)
+        self.mark_known(cell)
+        return self.knowledge.mark_safe(cell)
+
+    def mark_known(self, cell):
+        """
+        Removes `cell` from the cells not yet known, by moving the last
+        of them into its place.
+        """
+        cellId = cell[0] * self.width + cell[1]
+        position = self.unknownPosition[cellId]
+        if position < 0:
+            return
+        last = self.unknown.pop()
+        if last != cellId:
+            self.unknown[position] = last
+            self.unknownPosition[last] = position
+        self.unknownPosition[cellId] = -1
 
     def add_knowledge(self, cell, count):
         """
@@ -195,10 +470,11 @@ class MinesweeperAI():
                if they can be inferred from existing knowledge
         """
         self.moves_made.add(cell)
+        self.safeMoves.discard(cell)
         #mark safe
-        self.mark_safe (cell)
+        touched = self.mark_safe (cell)
 
-        self.update_knowledge_base (cell, count)
+        self.update_knowledge_base (cell, count, touched)
 
     def make_safe_move(self):
         """
@@ -208,31 +484,199 @@ class MinesweeperAI():
 
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
+        Safe cells not yet played are kept in self.safeMoves as they are
+        found, so a move is taken from there without scanning self.safes.
         """
-        safeMovesAvail = self.safes.difference(self.moves_made)
-
-        if len(safeMovesAvail) > 0:
-            return safeMovesAvail.pop()
+        if len(self.safeMoves) > 0:
+            return self.safeMoves.pop()
         else:
             return
 
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Should choose among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+
+        The cell least likely to be a mine is chosen, given the
+        knowledge base and the number of mines left: a cell mentioned by
+        no sentence is picked at random when those are the safest bet.
+        Returns None if there is no such cell.
         """
-        availableCells = self.allCells
-        availableCells.difference_update (self.moves_made)
-        availableCells.difference_update (self.mines)
-        indexToReturn = 0
+        probabilities, unconstrained = self.mine_probabilities()
+        numUnconstrained = len(self.unknown) - len(probabilities)
 
-        # TODO: would be nice - prefer empty cell surrounded by 1s than one surrounded by 3s
-        return availableCells.pop()
+        best = min(probabilities, key=probabilities.get, default=None)
+        if numUnconstrained > 0 and (best is None or unconstrained < probabilities[best]):
+            return self.random_unconstrained_cell()
+        if best is None:
+            return None
+        return divmod(best, self.width)
+
+    def mine_probabilities(self):
+        """
+        Returns a dict from the number of each cell mentioned by the
+        knowledge base to the probability it is a mine, and the
+        probability a cell mentioned by no sentence is a mine.
+
+        Cells sharing no sentence are split into independent components,
+        and the mine configurations of each are counted exactly, weighted
+        by the ways of placing the remaining mines among the cells no
+        sentence mentions. A component larger than MAX_COMPONENT, or
+        reached once MOVE_STATES states have been counted, gets the
+        highest count / size of the sentences about each of its cells
+        instead.
+        """
+        statesLeft = MOVE_STATES
+        solved = []
+        probabilities = dict()
+        remaining = self.totalMines - len(self.mines)
+        for cells, sentences in sorted(self.frontier_components(), key=lambda c: len(c[0])):
+            distribution = None
+            if len(cells) <= MAX_COMPONENT:
+                try:
+                    distribution, states = self.component_distribution(cells, sentences, statesLeft)
+                    statesLeft -= states
+                except CountLimitReached:
+                    statesLeft = 0
+            if distribution:
+                solved.append((cells, distribution))
+                continue
+            for cellId in cells:
+                probabilities[cellId] = max(
+                    sentence.count / sentence.size
+                    for sentence in map(self.knowledge.get, self.knowledge.index[cellId])
+                )
+            remaining -= round(sum(probabilities[cellId] for cellId in cells))
+
+        # prefix[i] and suffix[i] are the distributions of the number of
+        # mines in the solved components before and from the i-th
+        distributions = [mine_distribution(distribution) for cells, distribution in solved]
+        prefix = [[1.0]]
+        for distribution in distributions:
+            prefix.append(convolve(prefix[-1], distribution))
+        suffix = [[1.0]]
+        for distribution in reversed(distributions):
+            suffix.insert(0, convolve(distribution, suffix[0]))
+        total = prefix[-1]
+
+        numUnconstrained = len(self.unknown) - len(self.knowledge.index)
+        weights = combination_weights(numUnconstrained, max(remaining, 0), len(total) - 1)
+        norm = sum(p * weight_at(weights, t) for t, p in enumerate(total))
+        if norm == 0:
+            weights = [1.0] * len(total)
+            norm = sum(total)
+
+        for i, (cells, distribution) in enumerate(solved):
+            others = convolve(prefix[i], suffix[i + 1])
+            mineWays = [0.0] * len(cells)
+            for mines, (ways, cellWays) in distribution.items():
+                weight = sum(p * weight_at(weights, mines + t) for t, p in enumerate(others))
+                for k, w in enumerate(cellWays):
+                    mineWays[k] += w * weight
+            for cellId, w in zip(cells, mineWays):
+                probabilities[cellId] = w / norm
+
+        if numUnconstrained == 0:
+            return probabilities, 1.0
+        expected = sum(p * weight_at(weights, t) * (remaining - t) for t, p in enumerate(total)) / norm
+        return probabilities, min(max(expected / numUnconstrained, 0.0), 1.0)
+
+    def frontier_components(self):
+        """
+        Returns the cells mentioned by the knowledge base split into
+        components sharing no sentence, each as a list of cell numbers,
+        in the order they were reached, and a list of its sentences.
+        """
+        components = []
+        visited = set()
+        for start in self.knowledge.index:
+            if start in visited:
+                continue
+            visited.add(start)
+            cells = [start]
+            sentenceIds = set()
+            for cellId in cells:
+                for sentenceId in self.knowledge.index[cellId]:
+                    if sentenceId in sentenceIds:
+                        continue
+                    sentenceIds.add(sentenceId)
+                    for other in self.knowledge.get(sentenceId).ids():
+                        if other not in visited:
+                            visited.add(other)
+                            cells.append(other)
+            components.append((cells, [self.knowledge.get(i) for i in sentenceIds]))
+        return components
+
+    def component_distribution(self, cells, sentences, maxStates):
+        """
+        Counts the mine configurations of `cells` consistent with
+        `sentences`, assigning cells in order by backtracking, with the
+        counts memoized on the mines each sentence still needs.
+
+        Returns a dict from each possible number of mines among `cells`
+        to a pair: the number of configurations with that many mines,
+        and a list of how many of those have each cell a mine. Also
+        returns the number of states counted, and raises
+        CountLimitReached rather than count more than `maxStates`.
+        """
+        position = {cellId: pos for pos, cellId in enumerate(cells)}
+
+        # For each cell, the sentences about it and how many of their
+        # cells come after it
+        constraints = [[] for _ in cells]
+        for j, sentence in enumerate(sentences):
+            positions = sorted(position[cellId] for cellId in sentence.ids())
+            for k, pos in enumerate(positions):
+                constraints[pos].append((j, len(positions) - k - 1))
+
+        memo = dict()
+
+        def count(pos, needed):
+            if pos == len(cells):
+                return {0: (1, [])}
+            if (pos, needed) in memo:
+                return memo[(pos, needed)]
+            if len(memo) >= maxStates:
+                raise CountLimitReached
+
+            result = dict()
+            for mine in (0, 1):
+                left = list(needed)
+                for j, after in constraints[pos]:
+                    left[j] -= mine
+                    if not 0 <= left[j] <= after:
+                        break
+                else:
+                    for mines, (ways, cellWays) in count(pos + 1, tuple(left)).items():
+                        total, totalCells = result.get(mines + mine, (0, [0] * (len(cells) - pos)))
+                        totalCells[0] += ways * mine
+                        for k, w in enumerate(cellWays, 1):
+                            totalCells[k] += w
+                        result[mines + mine] = (total + ways, totalCells)
+            memo[(pos, needed)] = result
+            return result
+
+        distribution = count(0, tuple(sentence.count for sentence in sentences))
+        return distribution, len(memo)
+
+    def random_unconstrained_cell(self):
+        """
+        Returns a random cell not yet known and not mentioned by the
+        knowledge base.
+        """
+        # Guess among the unknown cells a few times; if that fails the
+        # unknown cells are mostly on the frontier, so there are few of them
+        for _ in range(100):
+            cellId = random.choice(self.unknown)
+            if cellId not in self.knowledge.index:
+                return divmod(cellId, self.width)
+        cellId = random.choice([cellId for cellId in self.unknown if cellId not in self.knowledge.index])
+        return divmod(cellId, self.width)
 
     # new methods added by jason
-    def update_knowledge_base (self, cell, count):
+    def update_knowledge_base (self, cell, count, touched=()):
         """
             1) add a new sentence to the AI's knowledge base
                based on the value of `cell` and `count`
@@ -240,64 +684,72 @@ class MinesweeperAI():
                if it can be concluded based on the AI's knowledge base
             3) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
+
+        `touched` are ids of sentences already changed by this move,
+        which are revisited along with the new sentence.
+        """
+        unknownCells, count = self.get_unknown_cells (cell, count)
+        queue = deque(touched)
+        newId = self.knowledge.add (BitSentence (unknownCells, count, self.width))
+        if newId is not None:
+            queue.append(newId)
+        self.infer (queue)
+
+    def infer (self, queue):
         """
-        unknownCells = self.get_unknown_cells (cell, count)
-
-        newSentence = Sentence (unknownCells, count)
-
-
-        # iterate through knowledge - end to front append at end
-        numSentences = len(self.knowledge)
-        index = numSentences - 1
-        while index >= 0:
-            currSentence = self.knowledge[index]
-            # check if num cells matches count - if so mark them all as mines
-            numCells = len(currSentence.cells)
-            if numCells == currSentence.count:
-                j = 0
-                while j < numCells:
-                    self.mark_mine(currSentence.cells.pop())
-                    j += 1
-                currSentence.count = 0
-            # check if count = 0, mark them all as safe
-            elif currSentence.count == 0:
-                l = 0
-                numCells = len(currSentence.cells)
-                while l < numCells:
-                    self.mark_safe(currSentence.cells.pop())
-                    l += 1
-            # check if new sentence is subset of current sentence, if so add new sentence to knowledge base
-            if len(currSentence.cells) != 0 and len(newSentence.cells) != 0:
-                if newSentence.cells.issuperset(currSentence.cells):
-                    difference = Sentence(newSentence.cells.difference(currSentence.cells), newSentence.count-currSentence.count)
-                    self.knowledge.append(difference)
-                elif currSentence.cells.issuperset(newSentence.cells):
-                    difference = Sentence(currSentence.cells.difference(newSentence.cells), currSentence.count-newSentence.count)
-                    self.knowledge.append(difference)
-
-            index -= 1
-
-        # lastly append new sentence
-        if newSentence.count == 0:
-            k=0
-            numCells = len(newSentence.cells)
-            while k < numCells:
-                self.mark_safe(newSentence.cells.pop())
-                k += 1
-        if len(newSentence.cells) > 0:
-            self.knowledge.append(newSentence)
+        Runs inference to a fixed point from the sentence ids in `queue`.
+        A sentence whose cells are all mines or all safe has them marked,
+        and the sentences that changes are queued; any other sentence is
+        compared with the sentences sharing a cell with it, and the
+        difference of one contained in the other is added and queued.
+        Inference stops when no sentence is left to revisit, so no new
+        mines or safes can be concluded by these rules.
+        """
+        queued = set(queue)
+        while queue:
+            sentenceId = queue.popleft()
+            queued.discard(sentenceId)
+            sentence = self.knowledge.get (sentenceId)
+            if sentence is None:
+                continue
+
+            changed = set()
+            mines = sentence.known_mines()
+            safes = sentence.known_safes()
+            if mines or safes:
+                for mine in mines:
+                    changed.update(self.mark_mine(mine))
+                for safe in safes:
+                    changed.update(self.mark_safe(safe))
+            else:
+                for otherId in self.knowledge.related (sentence):
+                    other = self.knowledge.get (otherId)
+                    if other.size < sentence.size and other.issubset(sentence):
+                        difference = sentence.difference(other)
+                    elif sentence.size < other.size and sentence.issubset(other):
+                        difference = other.difference(sentence)
+                    else:
+                        continue
+                    changed.add(self.knowledge.add (difference))
+                changed.discard(None)
+
+            for otherId in changed:
+                if otherId not in queued:
+                    queued.add(otherId)
+                    queue.append(otherId)
 
     def get_unknown_cells (self, cell, count):
-        unknownCells = self.get_surrounding_cells (cell, count)
         """
-        1) omit safe cells - remove self.safes
-        2) omit mines and deduct from count - remove self.mines
+        Returns the cells around `cell` not yet known to be safe or
+        mines, and `count` less the known mines among them.
         """
-
-        unknownCells.difference (self.safes)
-        unknownCells.difference (self.mines)
-        count = len(unknownCells)
-        return unknownCells
+        unknownCells = set()
+        for neighbour in self.get_surrounding_cells (cell, count):
+            if neighbour in self.mines:
+                count -= 1
+            elif neighbour not in self.safes:
+                unknownCells.add(neighbour)
+        return unknownCells, count
 
     def get_surrounding_cells (self, cell, count):
         # get max. 8 surrounding cells minIndex = 0 
@@ -344,16 +796,44 @@ class MinesweeperAI():
 
         return surroundingCells
 
-    def init_all_cells (self):
 
-        allCells = set()
+def combination_weights(n, k, limit):
+    """
+    Returns a list whose t-th entry is proportional to the number of ways
+    of choosing k - t of n cells, for t from 0 to `limit` or k if less.
+    """
+    logs = [
+        math.lgamma(n + 1) - math.lgamma(k - t + 1) - math.lgamma(n - k + t + 1)
+        if k - t <= n else None
+        for t in range(min(k, limit) + 1)
+    ]
+    largest = max((log for log in logs if log is not None), default=0.0)
+    return [0.0 if log is None else math.exp(log - largest) for log in logs]
 
-        i = 0
-        while i <= self.height-1:
-            j = 0
-            while j <= self.width-1:
-                allCells.add ((i,j))
-                j += 1
-            i += 1
 
-        return allCells
+def weight_at(weights, t):
+    return weights[t] if 0 <= t < len(weights) else 0.0
+
+
+def mine_distribution(distribution):
+    """
+    Returns a list whose t-th entry is the number of configurations from
+    `distribution` with t mines.
+    """
+    counts = [0.0] * (max(distribution) + 1)
+    for mines, (ways, cellWays) in distribution.items():
+        counts[mines] = float(ways)
+    return counts
+
+
+def convolve(first, second):
+    """
+    Returns the distribution of the total number of mines over two
+    independent sets of cells with distributions `first` and `second`.
+    """
+    combined = [0.0] * (len(first) + len(second) - 1)
+    for i, a in enumerate(first):
+        if a:
+            for j, b in enumerate(second):
+                combined[i + j] += a * b
+    return combined
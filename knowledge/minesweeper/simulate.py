@@ -0,0 +1,194 @@
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+import benchmarking
+
+# Latency percentiles reported, in percent
+PERCENTILES = [50, 90, 99, 99.9]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play seeded Minesweeper games against the AI without a display.")
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int, default=8)
+    parser.add_argument("--games", type=int, default=1000,
+                        help="number of games to play")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game; game i is seeded with seed + i")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes the games are spread over")
+    parser.add_argument("--chunk", type=int, default=50,
+                        help="games each worker plays per task")
+    parser.add_argument("--output", metavar="FILE",
+                        help="also write the summary and per-game results to FILE as JSON")
+    args = parser.parse_args()
+    if args.mines >= args.height * args.width:
+        parser.error("there must be fewer mines than cells")
+    if args.games < 1:
+        parser.error("at least one game must be played")
+
+    start = time.perf_counter()
+    games = simulate(args.height, args.width, args.mines, range(args.seed, args.seed + args.games),
+                     args.workers, args.chunk)
+    elapsed = time.perf_counter() - start
+
+    summary = summarize(games, elapsed)
+    print(f"{args.games} games of {args.height}x{args.width} with {args.mines} mines "
+          f"on {args.workers} worker(s) in {elapsed:.2f}s")
+    print(format_summary(summary))
+
+    if args.output:
+        report = {
+            **benchmarking.run_details(),
+            "height": args.height,
+            "width": args.width,
+            "mines": args.mines,
+            "summary": summary,
+            "games": [{key: value for key, value in game.items() if key != "latencies"} for game in games],
+        }
+        benchmarking.write_report(args.output, report)
+
+
+def simulate(height, width, mines, seeds, workers=1, chunk=50):
+    """
+    Play a game for each seed in `seeds` and return the list of game
+    records in seed order. With more than one worker, chunks of `chunk`
+    games are spread over a process pool.
+    """
+    seeds = list(seeds)
+    if workers <= 1:
+        return play_games(height, width, mines, seeds)
+
+    chunks = [seeds[i:i + chunk] for i in range(0, len(seeds), chunk)]
+    games = []
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(play_games, height, width, mines, seeds) for seeds in chunks]
+        for future in as_completed(futures):
+            games.extend(future.result())
+    return sorted(games, key=lambda game: game["seed"])
+
+
+def play_games(height, width, mines, seeds):
+    return [play_game(height, width, mines, seed) for seed in seeds]
+
+
+def play_game(height, width, mines, seed):
+    """
+    Play one game seeded with `seed`, the AI making moves until it wins,
+    reveals a mine or has no move left, and return a record of the game.
+    Latency is the time the AI spends choosing each move and adding the
+    knowledge it reveals; the board's own work is not counted.
+    """
+    random.seed(seed)
+    game = Minesweeper(height=height, width=width, mines=mines)
+    ai = MinesweeperAI(height=height, width=width, mines=mines)
+
+    latencies = []
+    guesses = 0
+    largest = 0
+    result = "stuck"
+    while True:
+        moveStart = time.perf_counter()
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            guesses += move is not None
+        moveTime = time.perf_counter() - moveStart
+
+        if move is None:
+            break
+        if game.is_mine(move):
+            latencies.append(moveTime)
+            result = "lost"
+            break
+
+        nearby = game.nearby_mines(move)
+        updateStart = time.perf_counter()
+        ai.add_knowledge(move, nearby)
+        latencies.append(moveTime + time.perf_counter() - updateStart)
+        largest = max(largest, len(ai.knowledge))
+
+        if len(ai.moves_made) == height * width - mines:
+            result = "won"
+            break
+
+    return {
+        "seed": seed,
+        "result": result,
+        "moves": len(latencies),
+        "guesses": guesses,
+        "seconds": sum(latencies),
+        "knowledge": largest,
+        "latencies": latencies,
+    }
+
+
+def summarize(games, elapsed):
+    """
+    Return the win rate, throughput, latency percentiles and knowledge
+    base sizes over the game records `games`, played in `elapsed` seconds.
+    """
+    latencies = sorted(latency for game in games for latency in game["latencies"])
+    moves = len(latencies)
+    seconds = sum(latencies)
+    wins = sum(game["result"] == "won" for game in games)
+    winRate = wins / len(games)
+    return {
+        "games": len(games),
+        "won": wins,
+        "lost": sum(game["result"] == "lost" for game in games),
+        "stuck": sum(game["result"] == "stuck" for game in games),
+        "win_rate": winRate,
+        "win_rate_error": math.sqrt(winRate * (1 - winRate) / len(games)),
+        "moves": moves,
+        "guesses": sum(game["guesses"] for game in games),
+        "moves_per_second": moves / seconds if seconds > 0 else None,
+        "wall_moves_per_second": moves / elapsed if elapsed > 0 else None,
+        "latency_ms": {
+            f"p{q:g}": 1000 * percentile(latencies, q) for q in PERCENTILES
+        } | {"max": 1000 * latencies[-1] if latencies else None},
+        "knowledge_mean": sum(game["knowledge"] for game in games) / len(games),
+        "knowledge_max": max(game["knowledge"] for game in games),
+    }
+
+
+def percentile(values, q):
+    """
+    Return the `q`th percentile of the sorted list `values` by the
+    nearest-rank method, or None if it is empty.
+    """
+    if not values:
+        return None
+    rank = math.ceil(q / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def format_summary(summary):
+    latency = "  ".join(
+        f"{name} {value:.3f}" for name, value in summary["latency_ms"].items() if value is not None
+    )
+    lines = [
+        f"Win rate: {summary['win_rate']:.4f} ± {summary['win_rate_error']:.4f} "
+        f"({summary['won']} won, {summary['lost']} lost, {summary['stuck']} stuck)",
+        f"Moves: {summary['moves']} ({summary['guesses']} guesses)",
+    ]
+    if summary["moves_per_second"] is not None:
+        lines.append(f"Moves per second: {summary['moves_per_second']:.0f} per worker, "
+                     f"{summary['wall_moves_per_second']:.0f} overall")
+    lines.append(f"Latency (ms): {latency}")
+    lines.append(f"Knowledge base: {summary['knowledge_mean']:.1f} sentences at most on average, "
+                 f"{summary['knowledge_max']} at most in any game")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    main()
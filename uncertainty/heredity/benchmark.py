@@ -0,0 +1,177 @@
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import heredity
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+import benchmarking
+
+ENGINE_NAMES = list(heredity.ENGINES) + list(heredity.SAMPLERS)
+
+# Engines whose cost grows exponentially with family size
+BRUTE_FORCE = ["enumerate", "vectorized"]
+
+# Fields identifying a result record, with the format each is printed in
+COLUMNS = [("depth", ">5"), ("people", ">8"), ("stage", "<18")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the heredity engines on synthetic pedigrees.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="number of people in each generated pedigree")
+    parser.add_argument("--depths", type=int, nargs="+", default=[3, 6, 12],
+                        help="number of generations in each generated pedigree")
+    parser.add_argument("--engines", nargs="+", choices=ENGINE_NAMES, default=ENGINE_NAMES,
+                        help="engines to time")
+    parser.add_argument("--cousins", type=float, default=0.05,
+                        help="chance a couple are both from the family rather than one marrying in")
+    parser.add_argument("--observed", type=float, default=0.5,
+                        help="fraction of people whose trait is known")
+    parser.add_argument("--samples", type=int, default=1000,
+                        help="samples (Gibbs sweeps) drawn by the approximate engines")
+    parser.add_argument("--brute-limit", type=int, default=10,
+                        help="largest pedigree timed with the brute-force engines")
+    benchmarking.add_report_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    for depth in args.depths:
+        for size in args.sizes:
+            if depth > size:
+                continue
+            rng = np.random.default_rng(args.seed)
+            pedigree = generate_pedigree(size, depth, rng, args.cousins, args.observed)
+            for record in benchmark_pedigree(pedigree, args):
+                record.update(people=size, depth=depth)
+                results.append(record)
+                print(format_record(record))
+
+    report = {**benchmarking.run_details(numpy=np.__version__), "results": results}
+    benchmarking.write_report(args.output, report)
+
+    if args.compare:
+        benchmarking.compare_results(args.compare, results, COLUMNS)
+
+
+def generate_pedigree(numPeople, depth, rng, cousins=0.05, observed=0.5):
+    """
+    Return a synthetic Pedigree of `numPeople` people over `depth`
+    generations. The first generation are founders. In each later one,
+    members of the previous generation pair up with a founder marrying
+    in, or with probability `cousins` with another member, giving loops,
+    and have one to four children each. Each person's trait is known with
+    probability `observed`, and when known is present 30% of the time.
+    """
+    perGeneration = max(1, numPeople // depth)
+    mother = []
+    father = []
+
+    def add(mom, dad):
+        mother.append(mom)
+        father.append(dad)
+        return len(mother) - 1
+
+    generation = [add(-1, -1) for _ in range(min(perGeneration, numPeople))]
+    while len(mother) < numPeople:
+        unmarried = rng.permutation(generation).tolist()
+        children = []
+        while unmarried and len(children) < perGeneration and len(mother) < numPeople:
+            partner = unmarried.pop()
+            if unmarried and rng.random() < cousins:
+                spouse = unmarried.pop()
+            else:
+                spouse = add(-1, -1)
+            for _ in range(rng.integers(1, 5)):
+                if len(mother) >= numPeople:
+                    break
+                children.append(add(partner, spouse))
+        generation = children or [add(-1, -1) for _ in range(min(perGeneration, numPeople - len(mother)))]
+
+    trait = np.where(rng.random(numPeople) < observed, rng.random(numPeople) < 0.3, -1)
+    return heredity.Pedigree(
+        names=[f"P{i}" for i in range(numPeople)],
+        mother=np.array(mother, dtype=np.int32),
+        father=np.array(father, dtype=np.int32),
+        trait=trait.astype(np.int8),
+    )
+
+
+def write_csv(pedigree, filename):
+    """
+    Write `pedigree` to `filename` in the CSV format read by heredity.py.
+    """
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "mother", "father", "trait"])
+        for i, name in enumerate(pedigree.names):
+            mother = pedigree.mother[i]
+            father = pedigree.father[i]
+            writer.writerow([
+                name,
+                pedigree.names[mother] if mother >= 0 else "",
+                pedigree.names[father] if father >= 0 else "",
+                "" if pedigree.trait[i] < 0 else int(pedigree.trait[i]),
+            ])
+
+
+def benchmark_pedigree(pedigree, args):
+    """
+    Time loading `pedigree` and solving it with each engine, and return a
+    list of result records, one per stage, each with the counters
+    heredity's profiler collected during it.
+    """
+    numPeople = len(pedigree.names)
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "pedigree.csv")
+    write_csv(pedigree, filename)
+
+    stages = [
+        ("load_pedigree", lambda: heredity.load_pedigree(filename)),
+        ("family_components", lambda: heredity.family_components(pedigree)),
+    ]
+    options = {"samples": args.samples, "seed": args.seed}
+    for engine in args.engines:
+        if engine in BRUTE_FORCE and numPeople > args.brute_limit:
+            continue
+        stages.append((engine, lambda engine=engine: heredity.solve_components(
+            pedigree, engine, options=options
+        )))
+
+    records = []
+    try:
+        for name, stage in stages:
+            heredity.enable_profiling()
+            start = time.perf_counter()
+            record = {"stage": name}
+            try:
+                stage()
+            except (ValueError, MemoryError) as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+            record["seconds"] = time.perf_counter() - start
+            record["counts"] = heredity.disable_profiling().report()["counts"]
+            if not args.skip_memory and "error" not in record:
+                record["peak_bytes"] = benchmarking.peak_memory(stage)
+            records.append(record)
+    finally:
+        os.remove(filename)
+        os.rmdir(directory)
+    return records
+
+
+def format_record(record):
+    line = benchmarking.format_record(record, COLUMNS)
+    if "error" in record:
+        line += f"  {record['error']}"
+    elif "largest_clique" in record["counts"]:
+        line += f"  largest clique {record['counts']['largest_clique']}"
+    return line
+
+
+if __name__ == "__main__":
+    main()
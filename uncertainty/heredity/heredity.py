@@ -1,6 +1,19 @@
+import argparse
 import csv
+import functools
+import glob
+import heapq
 import itertools
+import json
+import math
+import os
+import platform
 import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
 
 PROBS = {
 
@@ -36,16 +49,380 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Possible gene counts, in the order used to index probability arrays
+GENES = (0, 1, 2)
+
+# Largest junction-tree clique (in people) exact inference will build
+MAX_CLIQUE_SIZE = 14
+
+# Joint probabilities the vectorized engine evaluates per batch
+VECTOR_BATCH = 1 << 20
+
+# A family with people numbered by their position in `names`. `mother`
+# and `father` are int32 arrays of indices, both -1 for someone whose
+# parents are not listed, and `trait` an int8 array of 1 (has the trait),
+# 0 (does not) or -1 (unknown).
+Pedigree = namedtuple("Pedigree", ["names", "mother", "father", "trait"])
+
+# Arrays derived from PROBS, indexed by gene count (and trait as 0 or 1).
+# `founder` and `child` are indexed first by a person's trait + 1, as
+# stored in a Pedigree, and hold their gene factor with that evidence
+# already multiplied in.
+ProbabilityTables = namedtuple("ProbabilityTables", ["prior", "transmission", "trait", "founder", "child"])
+
+# Tables built from the last PROBS seen, and the snapshot they were built from
+_tables = {"key": None, "tables": None}
+
+# Default number of samples (Gibbs sweeps) drawn by the approximate engines
+SAMPLES = 10000
+
+# Samples drawn at once by likelihood weighting, divided by family size
+WEIGHTING_CHUNK = 1 << 16
+
+# Batches each Gibbs chain is split into to estimate standard errors
+GIBBS_BATCHES = 10
+
+# Per-person pieces of the family's network used by the samplers. `order`
+# lists people with parents after their parents, `mother` and `father`
+# are indices (-1 for founders), `evidence` and `traitProb` are (people, 3)
+# arrays of each person's observed-trait likelihood and probability of
+# having the trait by gene, and `children` lists, for each person, the
+# (child, other parent, table) triples their gene appears in, where
+# table[other parent's gene][child's gene] is a row over their own gene.
+SamplingModel = namedtuple("SamplingModel", [
+    "order", "mother", "father", "evidence", "traitProb", "prior", "transmission", "children"
+])
+
+# Probabilities from an approximate engine with the standard error of
+# each. `effective` is the effective sample size of likelihood weighting,
+# which collapses when many traits are observed, or the samples drawn.
+SampleResult = namedtuple("SampleResult", ["probabilities", "errors", "samples", "effective"])
+
+# Profile being collected, if profiling is enabled
+_profile = None
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Infer gene and trait probabilities for a family.")
+    parser.add_argument("data", nargs="+",
+                        help="CSV file with name, mother, father and trait columns, or for "
+                             "batch mode several files, directories or glob patterns")
+    parser.add_argument("--engine", choices=list(ENGINES) + list(SAMPLERS), default="exact",
+                        help="junction-tree inference (default), brute-force enumeration one "
+                             "assignment at a time or in NumPy batches, or approximate inference "
+                             "by likelihood weighting or Gibbs sampling")
+    parser.add_argument("--samples", type=int, default=SAMPLES,
+                        help=f"samples (Gibbs sweeps) drawn by the approximate engines (default: {SAMPLES})")
+    parser.add_argument("--seed", type=int,
+                        help="seed for the approximate engines")
+    parser.add_argument("--chains", type=int, default=4,
+                        help="independent chains the samples are split over (default: 4)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes used in batch mode (default: 1)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl",
+                        help="batch output format (default: jsonl)")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write batch results to FILE instead of standard output")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="write counters and stage timings for the run to FILE as JSON")
+    args = parser.parse_args()
+    if args.workers < 1:
+        sys.exit("--workers must be at least 1")
+
+    files = family_files(args.data)
+    if not files:
+        sys.exit("No CSV files found")
+    if args.chains < 1 or args.samples < args.chains:
+        sys.exit("--chains must be at least 1 and no more than --samples")
+    options = {"samples": args.samples, "seed": args.seed, "chains": args.chains}
+    if args.profile:
+        enable_profiling()
+    start = time.perf_counter()
+    try:
+        run(args, files, options)
+    finally:
+        if args.profile:
+            write_profile(args.profile, disable_profiling(), {
+                "engine": args.engine,
+                "files": files,
+                "workers": args.workers,
+                "wall_seconds": time.perf_counter() - start,
+            })
+
+
+def run(args, files, options):
+    """
+    Solve the families in `files` as main's arguments `args` ask, printing
+    the probabilities of a single family or writing batch results.
+    """
+    if len(args.data) > 1 or files != args.data or args.output:
+        output = open(args.output, "w", newline="") if args.output else sys.stdout
+        try:
+            run_batch(files, args.engine, args.workers, output, args.format, options)
+        finally:
+            if args.output:
+                output.close()
+        return
+
+    pedigree = load_pedigree(files[0])
+
+    # Compute gene and trait probabilities for each person
+    errors = None
+    result = solve_components(pedigree, args.engine, args.workers, options)
+    if args.engine in SAMPLERS:
+        probabilities, errors = result.probabilities, result.errors
+        if result.effective < 0.01 * result.samples:
+            print(
+                f"Warning: effective sample size is only {result.effective:.1f}, "
+                f"estimates are unreliable; try --engine gibbs",
+                file=sys.stderr
+            )
+    else:
+        probabilities = result
+
+    # Print results
+    for person in pedigree.names:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    print(f"    {value}: {p:.4f} ± {errors[person][field][value]:.4f}")
+
+
+def family_files(patterns):
+    """
+    Return the CSV files named by `patterns`, each of which may be a file,
+    a directory (all CSV files directly inside it) or a glob pattern.
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            files.extend(sorted(glob.glob(os.path.join(pattern, "*.csv"))))
+        elif os.path.isfile(pattern):
+            files.append(pattern)
+        else:
+            files.extend(sorted(glob.glob(pattern)))
+    return files
+
+
+def infer_family(filename, engine="exact", options=None, profile=False):
+    """
+    Load one family file and return a result record holding its
+    probabilities and the time taken, or the error that stopped it.
+    `options` are passed on to sample_probabilities for the approximate
+    engines. With `profile` the record also holds a profile report of
+    the call, for running in a worker process.
+    """
+    if profile:
+        enable_profiling()
+    start = time.perf_counter()
+    record = {"file": filename}
+    try:
+        pedigree = load_pedigree(filename)
+        probabilities = solve_components(pedigree, engine, options=options)
+        if engine in SAMPLERS:
+            probabilities = probabilities.probabilities
+    except (OSError, KeyError, ValueError, MemoryError) as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    else:
+        record["people"] = {
+            person: {
+                "gene": {str(gene): probabilities[person]["gene"][gene] for gene in GENES},
+                "trait": probabilities[person]["trait"][True]
+            }
+            for person in pedigree.names
+        }
+    record["seconds"] = time.perf_counter() - start
+    if profile:
+        record["profile"] = disable_profiling().report()
+    return record
+
+
+def run_batch(files, engine, workers, output, format="jsonl", options=None):
+    """
+    Infer probabilities for every family in `files`, writing each result
+    to `output` as soon as its family finishes. With more than one worker
+    the families are spread over a process pool, so results arrive in
+    completion order rather than file order. A summary of throughput is
+    reported on stderr.
+    """
+    start = time.perf_counter()
+    writer = None
+    if format == "csv":
+        writer = csv.writer(output)
+        writer.writerow(["file", "name", "gene0", "gene1", "gene2", "trait", "seconds", "error"])
+
+    # workers profile each family and send the report back to be merged
+    profile = _profile is not None and workers > 1
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers)
+        futures = [pool.submit(infer_family, filename, engine, options, profile) for filename in files]
+        records = (future.result() for future in as_completed(futures))
+    else:
+        records = (infer_family(filename, engine, options) for filename in files)
+
+    failed = 0
+    try:
+        for record in records:
+            if profile:
+                _profile.merge(record.pop("profile"))
+            failed += "error" in record
+            if writer is None:
+                output.write(json.dumps(record) + "\n")
+            elif "error" in record:
+                writer.writerow([record["file"], "", "", "", "", "", f"{record['seconds']:.6f}", record["error"]])
+            else:
+                for person, result in record["people"].items():
+                    writer.writerow(
+                        [record["file"], person] +
+                        [f"{result['gene'][str(gene)]:.6f}" for gene in GENES] +
+                        [f"{result['trait']:.6f}", f"{record['seconds']:.6f}", ""]
+                    )
+            output.flush()
+    finally:
+        if workers > 1:
+            pool.shutdown(cancel_futures=True)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(files)} families ({failed} failed) in {elapsed:.2f}s, "
+        f"{len(files) / elapsed:.1f} families/s",
+        file=sys.stderr
+    )
+
+
+class Profile():
+    """
+    Counters and per-stage call counts and times collected while
+    profiling is enabled. A stage's time includes the stages it calls.
+    """
+
+    def __init__(self):
+        self.counts = dict()
+        self.calls = dict()
+        self.seconds = dict()
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def maximum(self, name, value):
+        self.counts[name] = max(self.counts.get(name, value), value)
+
+    def add_stage(self, name, seconds, calls=1):
+        self.calls[name] = self.calls.get(name, 0) + calls
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def merge(self, report):
+        """
+        Add a report from another process's Profile to this one.
+        """
+        for name, value in report["counts"].items():
+            if name.startswith("largest_"):
+                self.maximum(name, value)
+            else:
+                self.count(name, value)
+        for name, stage in report["stages"].items():
+            self.calls[name] = self.calls.get(name, 0) + stage["calls"]
+            self.seconds[name] = self.seconds.get(name, 0.0) + stage["seconds"]
+
+    def report(self):
+        return {
+            "counts": dict(sorted(self.counts.items())),
+            "stages": {
+                name: {"calls": self.calls[name], "seconds": self.seconds[name]}
+                for name in sorted(self.seconds, key=self.seconds.get, reverse=True)
+            },
+        }
+
+
+def enable_profiling():
+    """
+    Start collecting a new Profile and return it.
+    """
+    global _profile
+    _profile = Profile()
+    return _profile
+
+
+def disable_profiling():
+    """
+    Stop profiling and return the Profile collected.
+    """
+    global _profile
+    profile, _profile = _profile, None
+    return profile
+
+
+def profile_count(name, n=1):
+    """
+    Add `n` to the counter `name` if profiling is enabled.
+    """
+    if _profile is not None:
+        _profile.count(name, n)
+
+
+def profile_maximum(name, value):
+    """
+    Raise the counter `name` to `value` if profiling is enabled.
+    """
+    if _profile is not None:
+        _profile.maximum(name, value)
+
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+def profile_stage(name, seconds, calls=1):
+    """
+    Record `calls` runs of the stage `name` taking `seconds` in all, if
+    profiling is enabled, for stages inside a function rather than whole
+    functions.
+    """
+    if _profile is not None:
+        _profile.add_stage(name, seconds, calls)
+
+
+def profiled(function):
+    """
+    Decorate `function` so that, while profiling is enabled, its calls
+    and time are recorded as a stage named after it.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _profile is None:
+            return function(*args, **kwargs)
+        profile = _profile
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profile.add_stage(function.__name__, time.perf_counter() - start)
+    return wrapper
+
+
+def write_profile(filename, profile, details):
+    """
+    Write `profile`'s report, with the run's `details`, to `filename` as JSON.
+    """
+    report = {
+        **details,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **profile.report(),
+    }
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2)
+
+
+def empty_probabilities(people):
+    """
+    Return a probabilities structure with every distribution set to 0.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -60,40 +437,860 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
+
+@profiled
+def enumerate_probabilities(people):
+    """
+    Compute the probabilities structure for `people`, a data dictionary
+    or Pedigree, by brute force, summing the joint probability of every
+    assignment of genes and traits.
+
+    Assignments are streamed as bitmasks over the people of the Pedigree:
+    bit i of `have_trait`, `one_gene` and `two_genes` says whether person
+    i has the trait, one copy or two copies of the gene. For each gene
+    assignment only the trait assignments that agree with the known
+    traits are expanded, and nothing is allocated per joint probability,
+    so memory stays constant however many assignments there are.
+    """
+    pedigree = as_pedigree(people)
+    numPeople = len(pedigree.names)
+    everyone = (1 << numPeople) - 1
+    mother = pedigree.mother.tolist()
+    father = pedigree.father.tolist()
+    traits = pedigree.trait.tolist()
+
+    # each person's gene factor, known trait included, looked up by
+    # their parents' genes and their own
+    tables = probability_tables()
+    factors = [
+        (tables.founder if mother[i] < 0 else tables.child)[traits[i] + 1].tolist()
+        for i in range(numPeople)
+    ]
+    traitTable = tables.trait.tolist()
+
+    # people with a known trait are fixed, the rest are free to vary
+    knownTrait = 0
+    fixedTrait = 0
+    for i in range(numPeople):
+        if traits[i] >= 0:
+            knownTrait |= 1 << i
+            if traits[i] == 1:
+                fixedTrait |= 1 << i
+    freeTrait = everyone & ~knownTrait
+
+    freePeople = [i for i in range(numPeople) if freeTrait >> i & 1]
+
+    geneTotals = [[0.0, 0.0, 0.0] for _ in range(numPeople)]
+    traitTotals = [[0.0, 0.0] for _ in range(numPeople)]
+    genes = [0] * numPeople
+    pruned = 0
+
+    # time spent adding joint probabilities into the totals
+    timing = _profile is not None
+    accumulateSeconds = 0.0
+
+    for one_gene in range(everyone + 1):
+        for two_genes in submasks(everyone & ~one_gene):
+            for i in range(numPeople):
+                genes[i] = (one_gene >> i & 1) | (two_genes >> i & 1) << 1
+
+            # probability of the genes and of the known traits
+            geneP = 1.0
+            for i in range(numPeople):
+                if mother[i] < 0:
+                    geneP *= factors[i][genes[i]]
+                else:
+                    geneP *= factors[i][genes[mother[i]]][genes[father[i]]][genes[i]]
+
+            # assignments the evidence rules out add nothing
+            if geneP == 0.0:
+                pruned += 1
+                continue
+
+            # expand only the trait assignments consistent with evidence
+            if timing:
+                start = time.perf_counter()
+            total = 0.0
+            for have_trait in submasks(freeTrait):
+                p = geneP
+                for i in freePeople:
+                    p *= traitTable[genes[i]][have_trait >> i & 1]
+                for i in freePeople:
+                    traitTotals[i][have_trait >> i & 1] += p
+                total += p
+
+            for i in range(numPeople):
+                geneTotals[i][genes[i]] += total
+                if knownTrait >> i & 1:
+                    traitTotals[i][fixedTrait >> i & 1] += total
+            if timing:
+                accumulateSeconds += time.perf_counter() - start
+
+    profile_count("gene_assignments", len(GENES) ** numPeople)
+    profile_count("pruned_assignments", pruned)
+    profile_count("joint_probabilities", (len(GENES) ** numPeople - pruned) << len(freePeople))
+    profile_stage("accumulate", accumulateSeconds, len(GENES) ** numPeople - pruned)
+    return array_probabilities(pedigree, np.array(geneTotals), np.array(traitTotals))
+
+
+def submasks(mask):
+    """
+    Yield every submask of the bitmask `mask`, from `mask` down to 0.
+    """
+    subset = mask
+    while True:
+        yield subset
+        if subset == 0:
+            return
+        subset = (subset - 1) & mask
+
+
+@profiled
+def vectorized_probabilities(people, batchSize=VECTOR_BATCH):
+    """
+    Compute the probabilities structure for `people`, a data dictionary
+    or Pedigree, by brute-force enumeration, evaluating joint
+    probabilities in NumPy batches.
+
+    Gene assignments are numbered in base 3, digit i being person i's
+    gene count, and decoded a batch at a time into a (batch, people)
+    array. Each batch is broadcast against every trait assignment that
+    agrees with the known traits, giving a (batch, traits) tensor of
+    joint probabilities that is reduced into the marginals with
+    bincount and a matrix product. `batchSize` bounds how many joint
+    probabilities are held in memory at once.
+    """
+    pedigree = as_pedigree(people)
+    numPeople = len(pedigree.names)
+    mother = pedigree.mother
+    father = pedigree.father
+    children = np.flatnonzero(mother >= 0)
+    founders = np.flatnonzero(mother < 0)
+    free = np.flatnonzero(pedigree.trait < 0)
+
+    tables = probability_tables()
+    founderFactors = tables.founder[pedigree.trait[founders] + 1]
+    childFactors = tables.child[pedigree.trait[children] + 1]
+    traitTable = tables.trait
+
+    # row t holds whether each free person has the trait in assignment t
+    traitBits = (np.arange(1 << len(free))[:, None] >> np.arange(len(free))) & 1
+    rows = max(1, batchSize // (len(traitBits) * max(1, len(free))))
+    powers = 3 ** np.arange(numPeople, dtype=np.int64)
+    offsets = len(GENES) * np.arange(numPeople)
+
+    geneTotals = np.zeros((numPeople, len(GENES)))
+    traitTotals = np.zeros((numPeople, 2))
+    total = 0.0
+    for start in range(0, len(GENES) ** numPeople, rows):
+        codes = np.arange(start, min(start + rows, len(GENES) ** numPeople), dtype=np.int64)
+        genes = codes[:, None] // powers % len(GENES)
+
+        # probability of the genes and of the known traits
+        factors = np.empty(genes.shape)
+        factors[:, founders] = founderFactors[np.arange(len(founders)), genes[:, founders]]
+        factors[:, children] = childFactors[
+            np.arange(len(children)), genes[:, mother[children]], genes[:, father[children]], genes[:, children]
+        ]
+        geneP = factors.prod(axis=1)
+
+        # drop assignments the evidence rules out before broadcasting
+        possible = geneP > 0
+        profile_count("gene_assignments", len(geneP))
+        profile_count("pruned_assignments", len(geneP) - int(possible.sum()))
+        if not possible.all():
+            genes = genes[possible]
+            geneP = geneP[possible]
+
+        # joint probability of each gene assignment with each free trait assignment
+        joint = geneP[:, None] * traitTable[genes[:, None, free], traitBits[None]].prod(axis=2)
+        profile_count("joint_probabilities", joint.size)
+
+        accumulateStart = time.perf_counter()
+        rowTotals = joint.sum(axis=1)
+        geneTotals += np.bincount(
+            (genes + offsets).ravel(), weights=np.repeat(rowTotals, numPeople),
+            minlength=numPeople * len(GENES)
+        ).reshape(numPeople, len(GENES))
+        traitTotals[free, 1] += (joint @ traitBits).sum(axis=0)
+        total += rowTotals.sum()
+        profile_stage("accumulate", time.perf_counter() - accumulateStart)
+    traitTotals[free, 0] = total - traitTotals[free, 1]
+    traitTotals[pedigree.trait == 0, 0] = total
+    traitTotals[pedigree.trait == 1, 1] = total
+
+    return array_probabilities(pedigree, geneTotals, traitTotals)
+
+
+@profiled
+def infer_probabilities(people):
+    """
+    Compute the probabilities structure for `people`, a data dictionary
+    or Pedigree, exactly by message passing on a junction tree.
+
+    The family is compiled into a Bayesian network over gene counts:
+    parents' genes condition each child's gene, and observed traits enter
+    as evidence on the person's own gene. Unobserved traits are summed out
+    and their distribution recovered from the gene marginal afterwards.
+    For pedigrees the cliques stay small, so the cost grows linearly with
+    the number of people.
+    """
+    pedigree = as_pedigree(people)
+    numPeople = len(pedigree.names)
+    cliques = build_junction_tree(numPeople, family_factors(pedigree))
+    marginals = calibrate(cliques)
+    genes = np.array([marginals[i] for i in range(numPeople)]).reshape(numPeople, len(GENES))
+
+    traits = genes @ probability_tables().trait
+    known = pedigree.trait >= 0
+    traits[known] = np.eye(2)[pedigree.trait[known]]
+    return array_probabilities(pedigree, genes, traits)
+
+
+@profiled
+def solve_components(people, engine="exact", workers=1, options=None):
+    """
+    Solve each unrelated family in `people`, a data dictionary or
+    Pedigree, on its own with `engine` and combine the results. For the
+    sampling engines the result is a SampleResult whose effective sample
+    size is the smallest of any family's, otherwise a probabilities
+    structure.
+
+    Brute-force costs multiply across the people solved together, so k
+    unrelated families cost k small solves rather than one giant one.
+    With several families and `workers` > 1 they are spread over a
+    process pool; a single family passes `workers` on to the sampler.
+    Each family's sampler gets its own RNG stream spawned from the seed
+    in `options`.
+    """
+    pedigree = as_pedigree(people)
+    members = family_components(pedigree)
+    profile_count("families", len(members))
+    profile_maximum("largest_family", max((len(family) for family in members), default=0))
+    if len(members) == 1:
+        families = [pedigree]
+    else:
+        families = [sub_pedigree(pedigree, family) for family in members]
+    options = dict(options or {})
+    seed = options.pop("seed", None)
+    seeds = [seed]
+    if len(families) > 1:
+        seeds = np.random.SeedSequence(seed).spawn(len(families))
+
+    if workers > 1 and len(families) > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(
+                solve_family, families, [engine] * len(families), [options] * len(families), seeds,
+                chunksize=max(1, len(families) // (4 * workers))
+            ))
+    else:
+        results = [
+            solve_family(family, engine, options, seed, workers)
+            for family, seed in zip(families, seeds)
+        ]
+
+    if engine not in SAMPLERS:
+        combined = dict()
+        for result in results:
+            combined.update(result)
+        return {name: combined[name] for name in pedigree.names}
+
+    probabilities = dict()
+    errors = dict()
+    for result in results:
+        probabilities.update(result.probabilities)
+        errors.update(result.errors)
+    return SampleResult(
+        probabilities={name: probabilities[name] for name in pedigree.names},
+        errors={name: errors[name] for name in pedigree.names},
+        samples=results[0].samples,
+        effective=min(result.effective for result in results),
+    )
+
+
+def solve_family(pedigree, engine, options, seed=None, workers=1):
+    """
+    Solve `pedigree` with `engine`, passing `options` and `seed` on to
+    sample_probabilities for the sampling engines.
+    """
+    if engine in SAMPLERS:
+        return sample_probabilities(pedigree, engine, seed=seed, workers=workers, **options)
+    return ENGINES[engine](pedigree)
+
+
+@profiled
+def family_components(pedigree):
+    """
+    Return the unrelated families in `pedigree`, as arrays of people's
+    indices, found by union-find over the links between parents and
+    their children.
+    """
+    numPeople = len(pedigree.names)
+    root = list(range(numPeople))
+
+    def find(i):
+        while root[i] != i:
+            root[i] = root[root[i]]
+            i = root[i]
+        return i
+
+    for i, (mother, father) in enumerate(zip(pedigree.mother.tolist(), pedigree.father.tolist())):
+        if mother >= 0:
+            for parent in (mother, father):
+                a, b = find(i), find(parent)
+                if a != b:
+                    root[a] = b
+
+    families = dict()
+    for i in range(numPeople):
+        families.setdefault(find(i), []).append(i)
+    return [np.array(family, dtype=np.int32) for family in families.values()]
+
+
+def sub_pedigree(pedigree, members):
+    """
+    Return the Pedigree of the people at indices `members` of `pedigree`,
+    renumbered in that order. Parents must be among `members`.
+    """
+    position = np.full(len(pedigree.names), -1, dtype=np.int32)
+    position[members] = np.arange(len(members), dtype=np.int32)
+    mother = pedigree.mother[members]
+    father = pedigree.father[members]
+    return Pedigree(
+        names=[pedigree.names[i] for i in members.tolist()],
+        mother=np.where(mother >= 0, position[mother], -1).astype(np.int32),
+        father=np.where(father >= 0, position[father], -1).astype(np.int32),
+        trait=pedigree.trait[members],
+    )
+
+
+@profiled
+def array_probabilities(pedigree, genes, traits):
+    """
+    Return the probabilities structure for `pedigree` from a (people, 3)
+    array of gene weights and a (people, 2) array of weights for not
+    having and having the trait, normalizing each distribution.
+    """
+    genes = genes / genes.sum(axis=1, keepdims=True)
+    traits = traits / traits.sum(axis=1, keepdims=True)
+    probabilities = empty_probabilities(pedigree.names)
+    for i, name in enumerate(pedigree.names):
+        for gene in GENES:
+            probabilities[name]["gene"][gene] = float(genes[i, gene])
+        probabilities[name]["trait"][True] = float(traits[i, 1])
+        probabilities[name]["trait"][False] = float(traits[i, 0])
+    return probabilities
+
+
+def family_factors(pedigree):
+    """
+    Return the factors of the family's Bayesian network as (scope, table)
+    pairs. Variables are people's indices in `pedigree`, each the person's
+    gene count, and a table has one axis of size 3 per variable in its
+    scope. A person with known parents gets a (mother, father, person)
+    factor, anyone else a prior over their own gene; either is multiplied
+    by the probability of the person's observed trait, if any.
+    """
+    tables = probability_tables()
+    factors = []
+    for i, (mother, father, trait) in enumerate(zip(
+        pedigree.mother.tolist(), pedigree.father.tolist(), pedigree.trait.tolist()
+    )):
+        if mother >= 0:
+            factors.append(((mother, father, i), tables.child[trait + 1]))
+        else:
+            factors.append(((i,), tables.founder[trait + 1]))
+    return factors
+
+
+def transmission_table():
+    """
+    Return a 3x3x3 array whose [mother, father, child] entry is the
+    probability of the child having that many copies of the gene given
+    its parents' gene counts.
+    """
+    return probability_tables().transmission
+
+
+def probability_tables():
+    """
+    Return the ProbabilityTables for the current PROBS. They are built
+    once and reused until PROBS changes, so engines can look factors up
+    instead of recomputing them. The arrays are read-only.
+    """
+    key = probs_key()
+    if _tables["key"] != key:
+        _tables["tables"] = build_probability_tables()
+        _tables["key"] = key
+    return _tables["tables"]
+
+
+def probs_key():
+    """
+    Return a hashable snapshot of every value in PROBS.
+    """
+    return (
+        tuple(PROBS["gene"][gene] for gene in GENES),
+        tuple((PROBS["trait"][gene][False], PROBS["trait"][gene][True]) for gene in GENES),
+        PROBS["mutation"],
+    )
+
+
+def build_probability_tables():
+    """
+    Build ProbabilityTables from PROBS.
+    """
+    mutation = PROBS["mutation"]
+    passes = np.array([mutation, 0.5, 1 - mutation])
+    transmission = np.empty((len(GENES), len(GENES), len(GENES)))
+    for mother in GENES:
+        for father in GENES:
+            fromMother = passes[mother]
+            fromFather = passes[father]
+            transmission[mother, father, 2] = fromMother * fromFather
+            transmission[mother, father, 1] = (fromMother * (1 - fromFather) +
+                                               (1 - fromMother) * fromFather)
+            transmission[mother, father, 0] = (1 - fromMother) * (1 - fromFather)
+
+    prior = np.array([PROBS["gene"][gene] for gene in GENES])
+    trait = np.array([[PROBS["trait"][gene][False], PROBS["trait"][gene][True]] for gene in GENES])
+    # likelihood of an unknown trait, no trait and the trait, by gene
+    evidence = np.stack([np.ones(len(GENES)), trait[:, 0], trait[:, 1]])
+    tables = ProbabilityTables(
+        prior=prior,
+        transmission=transmission,
+        trait=trait,
+        founder=prior * evidence,
+        child=transmission * evidence[:, None, None, :],
+    )
+    for array in tables:
+        array.flags.writeable = False
+    return tables
+
+
+@profiled
+def build_junction_tree(numVars, factors):
+    """
+    Eliminate variables in greedy min-degree order and return the
+    resulting junction tree as a list of cliques in elimination order.
+
+    Eliminating variable v creates the clique {v} + its separator (v's
+    remaining neighbours), whose parent is the clique of the separator
+    variable eliminated next. Each factor is multiplied into the clique
+    of the first of its variables to be eliminated.
+    """
+    neighbours = [set() for _ in range(numVars)]
+    for scope, _ in factors:
+        for var in scope:
+            neighbours[var].update(scope)
+    for var in range(numVars):
+        neighbours[var].discard(var)
+
+    # min-degree ordering with a lazily updated heap
+    heap = [(len(neighbours[var]), var) for var in range(numVars)]
+    heapq.heapify(heap)
+    eliminated = [False] * numVars
+    order = []
+    separators = []
+    while heap:
+        degree, var = heapq.heappop(heap)
+        if eliminated[var] or degree != len(neighbours[var]):
             continue
+        eliminated[var] = True
+        order.append(var)
+        separators.append(sorted(neighbours[var]))
+        for other in neighbours[var]:
+            neighbours[other].discard(var)
+            neighbours[other].update(neighbours[var] - {other})
+            heapq.heappush(heap, (len(neighbours[other]), other))
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
+    position = {var: k for k, var in enumerate(order)}
+    cliques = []
+    for var, separator in zip(order, separators):
+        scope = [var] + separator
+        if len(scope) > MAX_CLIQUE_SIZE:
+            raise ValueError(
+                f"Family is too interconnected for exact inference "
+                f"(clique of {len(scope)} people)"
+            )
+        parent = min((position[other] for other in separator), default=None)
+        cliques.append({
+            "var": var,
+            "scope": scope,
+            "separator": separator,
+            "parent": parent,
+            "children": [],
+            "potential": np.ones([len(GENES)] * len(scope)),
+        })
+    for k, clique in enumerate(cliques):
+        if clique["parent"] is not None:
+            cliques[clique["parent"]]["children"].append(k)
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    profile_count("cliques", len(cliques))
+    profile_maximum("largest_clique", max((len(clique["scope"]) for clique in cliques), default=0))
+    for scope, table in factors:
+        home = cliques[min(position[var] for var in scope)]
+        home["potential"] = home["potential"] * expand(table, scope, home["scope"])
+    return cliques
 
-    # Ensure probabilities sum to 1
-    normalize(probabilities)
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+def expand(table, scope, target):
+    """
+    Return `table`, whose axes follow the variables in `scope`, reshaped
+    to broadcast against an array whose axes follow `target` (a superset).
+    """
+    axes = sorted(range(len(scope)), key=lambda k: target.index(scope[k]))
+    shape = [len(GENES) if var in scope else 1 for var in target]
+    return np.transpose(table, axes).reshape(shape)
+
+
+def marginal(table, scope, keep):
+    """
+    Sum `table` (axes following `scope`) down to the variables in `keep`,
+    returned with axes in the order of `keep`.
+    """
+    drop = tuple(k for k, var in enumerate(scope) if var not in keep)
+    summed = table.sum(axis=drop)
+    remaining = [var for var in scope if var in keep]
+    return np.transpose(summed, [remaining.index(var) for var in keep])
+
+
+@profiled
+def calibrate(cliques):
+    """
+    Pass messages up and then down the junction tree and return, for
+    each variable, its normalized marginal distribution. Messages are
+    rescaled to sum to 1 so long pedigrees do not underflow.
+    """
+    up = [None] * len(cliques)
+    down = [None] * len(cliques)
+
+    # children come before their parent in elimination order
+    for k, clique in enumerate(cliques):
+        belief = clique["potential"]
+        for child in clique["children"]:
+            belief = belief * expand(up[child], cliques[child]["separator"], clique["scope"])
+        if clique["parent"] is not None:
+            message = marginal(belief, clique["scope"], clique["separator"])
+            up[k] = message / message.sum()
+
+    marginals = dict()
+    for k in reversed(range(len(cliques))):
+        clique = cliques[k]
+        base = clique["potential"]
+        if down[k] is not None:
+            base = base * expand(down[k], clique["separator"], clique["scope"])
+        incoming = [
+            expand(up[child], cliques[child]["separator"], clique["scope"])
+            for child in clique["children"]
+        ]
 
+        # prefix and suffix products give each child the product of
+        # every other incoming message without dividing
+        suffix = [None] * (len(incoming) + 1)
+        suffix[len(incoming)] = np.ones_like(base)
+        for j in reversed(range(len(incoming))):
+            suffix[j] = suffix[j + 1] * incoming[j]
+        prefix = base
+        for j, child in enumerate(clique["children"]):
+            message = marginal(prefix * suffix[j + 1], clique["scope"], cliques[child]["separator"])
+            down[child] = message / message.sum()
+            prefix = prefix * incoming[j]
 
+        belief = prefix
+        genes = marginal(belief, clique["scope"], [clique["var"]])
+        marginals[clique["var"]] = genes / genes.sum()
+    return marginals
+
+
+@profiled
+def sample_probabilities(people, method="gibbs", samples=SAMPLES, seed=None, chains=4, workers=1):
+    """
+    Estimate the probabilities structure for `people`, a data dictionary
+    or Pedigree, by sampling, and return a SampleResult whose `errors` has
+    the same structure holding the standard error of each estimate.
+
+    `method` is "weighting" for likelihood weighting, which samples genes
+    forward from the founders and weights each sample by the likelihood
+    of the observed traits, or "gibbs" for Gibbs sampling, which
+    resamples one person's gene at a time given everyone else's. Either
+    way an unobserved trait is estimated from P(trait | gene) rather than
+    sampled, which gives the same expectation with less noise.
+
+    The `samples` (Gibbs sweeps) are split over `chains` chains, each
+    with its own RNG stream spawned from `seed` (an integer or a
+    SeedSequence), run across `workers` processes. Results depend on the
+    seed and number of chains but not on `workers`.
+    """
+    if method not in SAMPLERS:
+        raise ValueError(f"Unknown sampling method: {method}")
+    pedigree = as_pedigree(people)
+    model = sampling_model(pedigree)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    streams = seed.spawn(chains)
+    lengths = [samples // chains + (1 if i < samples % chains else 0) for i in range(chains)]
+
+    profile_count("samples", samples)
+    sampler = SAMPLERS[method]
+    if workers > 1 and chains > 1:
+        with ProcessPoolExecutor(min(workers, chains)) as pool:
+            parts = list(pool.map(sampler, [model] * chains, lengths, streams))
+    else:
+        parts = list(map(sampler, [model] * chains, lengths, streams))
+
+    if method == "weighting":
+        estimates, errors, effective = weighted_estimates(parts)
+    else:
+        effective = samples
+        batches = np.concatenate(parts)
+        estimates = batches.mean(axis=0)
+        errors = np.zeros_like(estimates)
+        if len(batches) > 1:
+            errors = batches.std(axis=0, ddof=1) / math.sqrt(len(batches))
+    return SampleResult(
+        probabilities=feature_probabilities(pedigree, estimates),
+        errors=feature_probabilities(pedigree, errors, complement=False),
+        samples=samples,
+        effective=effective,
+    )
+
+
+def sampling_model(pedigree):
+    """
+    Return the SamplingModel for the family in `pedigree`.
+    """
+    numPeople = len(pedigree.names)
+    tables = probability_tables()
+    mother = pedigree.mother.tolist()
+    father = pedigree.father.tolist()
+    known = pedigree.trait >= 0
+    evidence = np.concatenate([np.ones((1, len(GENES))), tables.trait.T])[pedigree.trait + 1]
+    traitProb = np.tile(tables.trait[:, 1], (numPeople, 1))
+    traitProb[known] = pedigree.trait[known, None]
+
+    # rows of the transmission table over the gene of a child's mother
+    # or father, given the other parent's gene and the child's
+    asMother = tables.transmission.transpose(1, 2, 0).tolist()
+    asFather = tables.transmission.transpose(0, 2, 1).tolist()
+    children = [[] for _ in range(numPeople)]
+    for i in range(numPeople):
+        if mother[i] >= 0 and mother[i] != father[i]:
+            children[mother[i]].append((i, father[i], asMother))
+            children[father[i]].append((i, mother[i], asFather))
+
+    return SamplingModel(
+        order=topological_order(mother, father),
+        mother=np.array(mother, dtype=np.int64),
+        father=np.array(father, dtype=np.int64),
+        evidence=evidence,
+        traitProb=traitProb,
+        prior=tables.prior,
+        transmission=tables.transmission,
+        children=children,
+    )
+
+
+def topological_order(mother, father):
+    """
+    Return the people in an order that puts everyone after their parents.
+    """
+    numPeople = len(mother)
+    waiting = [0] * numPeople
+    children = [[] for _ in range(numPeople)]
+    for i in range(numPeople):
+        if mother[i] >= 0:
+            for parent in {mother[i], father[i]}:
+                waiting[i] += 1
+                children[parent].append(i)
+    order = [i for i in range(numPeople) if waiting[i] == 0]
+    for i in order:
+        for child in children[i]:
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                order.append(child)
+    if len(order) < numPeople:
+        raise ValueError("Family contains someone who is their own ancestor")
+    return order
+
+
+def forward_sample(model, numSamples, rng):
+    """
+    Sample `numSamples` gene assignments forward from the founders,
+    ignoring the observed traits. Return a (samples, people) array of
+    gene counts and the log-likelihood of the observed traits under each.
+    """
+    genes = np.empty((numSamples, len(model.mother)), dtype=np.int64)
+    logWeights = np.zeros(numSamples)
+    logEvidence = np.log(model.evidence)
+    for i in model.order:
+        if model.mother[i] < 0:
+            distribution = np.broadcast_to(model.prior, (numSamples, len(GENES)))
+        else:
+            distribution = model.transmission[genes[:, model.mother[i]], genes[:, model.father[i]]]
+        cumulative = distribution.cumsum(axis=1)
+        draws = rng.random(numSamples) * cumulative[:, -1]
+        genes[:, i] = (draws[:, None] >= cumulative[:, :-1]).sum(axis=1)
+        logWeights += logEvidence[i, genes[:, i]]
+    return genes, logWeights
+
+
+def gene_features(model, genes):
+    """
+    Return the (samples, 4 * people) array of quantities whose means are
+    the marginals: an indicator per person and gene count, followed by
+    each person's probability of having the trait.
+    """
+    numSamples, numPeople = genes.shape
+    indicators = genes[:, :, None] == np.arange(len(GENES))
+    traits = model.traitProb[np.arange(numPeople), genes]
+    return np.concatenate([indicators.reshape(numSamples, -1), traits], axis=1)
+
+
+def weighting_chain(model, numSamples, stream):
+    """
+    Run likelihood weighting for `numSamples` samples and return its
+    running sums: the log of the scale weights are measured against, and
+    the sums of w, w^2, w*x, w^2*x and w^2*x^2 over samples with weight
+    w and features x. Weights are rescaled as larger ones arrive, so
+    families with many observed traits do not underflow.
+    """
+    rng = np.random.default_rng(stream)
+    numFeatures = (len(GENES) + 1) * len(model.mother)
+    chunk = max(1, WEIGHTING_CHUNK // len(model.mother))
+    logScale = -math.inf
+    sumW = sumW2 = 0.0
+    sumWX = np.zeros(numFeatures)
+    sumW2X = np.zeros(numFeatures)
+    sumW2X2 = np.zeros(numFeatures)
+    for start in range(0, numSamples, chunk):
+        genes, logWeights = forward_sample(model, min(chunk, numSamples - start), rng)
+        features = gene_features(model, genes)
+
+        top = logWeights.max()
+        if top > logScale:
+            rescale = math.exp(logScale - top)
+            sumW *= rescale
+            sumW2 *= rescale ** 2
+            sumWX *= rescale
+            sumW2X *= rescale ** 2
+            sumW2X2 *= rescale ** 2
+            logScale = top
+        weights = np.exp(logWeights - logScale)
+        squares = weights ** 2
+        sumW += weights.sum()
+        sumW2 += squares.sum()
+        sumWX += weights @ features
+        sumW2X += squares @ features
+        sumW2X2 += squares @ features ** 2
+    return logScale, sumW, sumW2, sumWX, sumW2X, sumW2X2
+
+
+def weighted_estimates(parts):
+    """
+    Combine the running sums of likelihood-weighting chains into the
+    self-normalized estimate of each feature, its standard error and the
+    effective sample size.
+    """
+    logScale = max(part[0] for part in parts)
+    sumW = sumW2 = 0.0
+    sumWX = sumW2X = sumW2X2 = 0.0
+    for partScale, w, w2, wx, w2x, w2x2 in parts:
+        rescale = math.exp(partScale - logScale)
+        sumW += w * rescale
+        sumW2 += w2 * rescale ** 2
+        sumWX = sumWX + wx * rescale
+        sumW2X = sumW2X + w2x * rescale ** 2
+        sumW2X2 = sumW2X2 + w2x2 * rescale ** 2
+    estimates = sumWX / sumW
+    variance = (sumW2X2 - 2 * estimates * sumW2X + estimates ** 2 * sumW2) / sumW ** 2
+    return estimates, np.sqrt(np.maximum(variance, 0)), sumW ** 2 / sumW2
+
+
+def gibbs_chain(model, numSweeps, stream):
+    """
+    Run a Gibbs sampler for `numSweeps` sweeps after a burn-in of a tenth
+    as many, starting from a forward sample, and return a (batches,
+    features) array of batch means of the features. Each person's
+    conditional distribution is averaged rather than their sampled gene.
+    """
+    rng = np.random.default_rng(stream)
+    numPeople = len(model.mother)
+    genes = forward_sample(model, 1, rng)[0][0].tolist()
+    mother = model.mother.tolist()
+    father = model.father.tolist()
+    own = [
+        (model.prior * model.evidence[i]).tolist() if mother[i] < 0 else
+        (model.transmission * model.evidence[i]).tolist()
+        for i in range(numPeople)
+    ]
+
+    numBatches = max(1, min(GIBBS_BATCHES, numSweeps))
+    burnIn = numSweeps // 10
+    sums = [[0.0] * (len(GENES) * numPeople) for _ in range(numBatches)]
+    counts = [0] * numBatches
+    for sweep in range(burnIn + numSweeps):
+        draws = rng.random(numPeople).tolist()
+        batch = None
+        if sweep >= burnIn:
+            batch = (sweep - burnIn) * numBatches // numSweeps
+            counts[batch] += 1
+        for i in range(numPeople):
+            if mother[i] < 0:
+                w0, w1, w2 = own[i]
+            else:
+                w0, w1, w2 = own[i][genes[mother[i]]][genes[father[i]]]
+            for child, other, table in model.children[i]:
+                row = table[genes[other]][genes[child]]
+                w0 *= row[0]
+                w1 *= row[1]
+                w2 *= row[2]
+            total = w0 + w1 + w2
+            u = draws[i] * total
+            genes[i] = 0 if u < w0 else 1 if u < w0 + w1 else 2
+            if batch is not None:
+                acc = sums[batch]
+                acc[3 * i] += w0 / total
+                acc[3 * i + 1] += w1 / total
+                acc[3 * i + 2] += w2 / total
+
+    geneMeans = np.array(sums).reshape(numBatches, numPeople, len(GENES)) / np.array(counts)[:, None, None]
+    traits = (geneMeans * model.traitProb).sum(axis=2)
+    return np.concatenate([geneMeans.reshape(numBatches, -1), traits], axis=1)
+
+
+def feature_probabilities(pedigree, values, complement=True):
+    """
+    Return a probabilities structure filled from an array laid out like
+    gene_features. With `complement` the probability of not having the
+    trait is 1 minus that of having it, otherwise the same value is used
+    for both, as for standard errors.
+    """
+    numPeople = len(pedigree.names)
+    genes = values[:len(GENES) * numPeople].reshape(numPeople, len(GENES))
+    traits = values[len(GENES) * numPeople:]
+    probabilities = empty_probabilities(pedigree.names)
+    for i, name in enumerate(pedigree.names):
+        for gene in GENES:
+            probabilities[name]["gene"][gene] = float(genes[i, gene])
+        probabilities[name]["trait"][True] = float(traits[i])
+        probabilities[name]["trait"][False] = float(1 - traits[i] if complement else traits[i])
+    return probabilities
+
+
+ENGINES = {
+    "exact": infer_probabilities,
+    "enumerate": enumerate_probabilities,
+    "vectorized": vectorized_probabilities,
+}
+
+SAMPLERS = {
+    "weighting": weighting_chain,
+    "gibbs": gibbs_chain,
+}
+
+
+@profiled
 def load_data(filename):
     """
     Load gene and trait data from a file into a dictionary.
@@ -116,79 +1313,79 @@ def load_data(filename):
     return data
 
 
-def powerset(s):
+@profiled
+def load_pedigree(filename):
     """
-    Return a list of all possible subsets of set s.
+    Load a family from a CSV file in the format read by load_data straight
+    into a Pedigree, without building a dictionary per person.
     """
-    s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
-
-
-def get_no_genes (people, one_gene, two_genes):
-    # get all people remove one and two genes
-    allPeeps = people.keys()
-
-    remPeeps = allPeeps - one_gene
-    remPeeps = remPeeps - two_genes
-    return remPeeps
-
-def get_doesnt_have_trait (people, has_trait):
-    # get all people remove one and two genes
-    allPeeps = people.keys()
-
-    remPeeps = allPeeps - has_trait
-    return remPeeps
-
-def prob_no_genes(no_genes):
-
-    raise NotImplementedError
-
-def prob_one_gene(one_genes):
+    with open(filename) as f:
+        rows = [(row["name"], row["mother"], row["father"], row["trait"]) for row in csv.DictReader(f)]
+    names = [row[0] for row in rows]
+    index = {name: i for i, name in enumerate(names)}
+    mother = np.full(len(rows), -1, dtype=np.int32)
+    father = np.full(len(rows), -1, dtype=np.int32)
+    trait = np.full(len(rows), -1, dtype=np.int8)
+    for i, (name, mom, dad, value) in enumerate(rows):
+        if mom and dad:
+            if mom not in index or dad not in index:
+                raise ValueError(f"Parent of {name} is not in {filename}")
+            mother[i] = index[mom]
+            father[i] = index[dad]
+        if value in ("0", "1"):
+            trait[i] = int(value)
+    return Pedigree(names, mother, father, trait)
 
 
-    raise NotImplementedError
+def build_pedigree(people):
+    """
+    Return a Pedigree for `people`, a dictionary in the format returned
+    by load_data.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    mother = np.full(len(names), -1, dtype=np.int32)
+    father = np.full(len(names), -1, dtype=np.int32)
+    trait = np.full(len(names), -1, dtype=np.int8)
+    for i, name in enumerate(names):
+        person = people[name]
+        if person["mother"] is not None and person["father"] is not None:
+            mother[i] = index[person["mother"]]
+            father[i] = index[person["father"]]
+        if person["trait"] is not None:
+            trait[i] = int(person["trait"])
+    return Pedigree(names, mother, father, trait)
 
-def prob_two_genes(two_genes):
 
-    raise NotImplementedError
+def as_pedigree(people):
+    """
+    Return `people` as a Pedigree, converting a data dictionary if needed.
+    """
+    return people if isinstance(people, Pedigree) else build_pedigree(people)
 
-def prob_has_trait(has_trait):
 
-    raise NotImplementedError
+def powerset(s):
+    """
+    Lazily yield every possible subset of set s.
+    """
+    s = list(s)
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(s, r) for r in range(len(s) + 1)
+    ):
+        yield set(subset)
 
 
-def prob_doesnt_have_trait(doesnt_have_trait):
+def gene_count(person, one_gene, two_genes):
+    """
+    Return how many copies of the gene `person` has in an assignment.
+    """
+    return 2 if person in two_genes else 1 if person in one_gene else 0
 
-    raise NotImplementedError
 
 def joint_probability(people, one_gene, two_genes, have_trait):
-
-    probability = dict()
-
-    no_genes = get_no_genes(people, one_gene, two_genes)
-
-    doesnt_have_trait=get_doesnt_have_trait(people, have_trait)
-
-    p0g = prob_no_genes(no_genes)
-
-    p1g = prob_one_gene(one_gene)
-
-    p2g = prob_two_genes(two_genes)
-
-    pht = prob_has_trait(have_trait)
-
-    pnt = prob_doesnt_have_trait(doesnt_have_trait)
-# TODO
-    #probability = dict("genes"=p0g, )
-
     """
     Compute and return a joint probability.
 
-
     The probability returned should be the probability that
         * everyone in set `one_gene` has one copy of the gene, and
         * everyone in set `two_genes` has two copies of the gene, and
@@ -196,9 +1393,22 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
     """
-
-    return probability
-
+    tables = probability_tables()
+    probability = 1
+    for person in people:
+        gene = gene_count(person, one_gene, two_genes)
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is None or father is None:
+            probability *= tables.prior[gene]
+        else:
+            probability *= tables.transmission[
+                gene_count(mother, one_gene, two_genes),
+                gene_count(father, one_gene, two_genes),
+                gene
+            ]
+        probability *= tables.trait[gene, int(person in have_trait)]
+    return float(probability)
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -208,7 +1418,9 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
     Which value for each distribution is updated depends on whether
     the person is in `have_gene` and `have_trait`, respectively.
     """
-#    raise NotImplementedError
+    for person in probabilities:
+        probabilities[person]["gene"][gene_count(person, one_gene, two_genes)] += p
+        probabilities[person]["trait"][person in have_trait] += p
 
 
 def normalize(probabilities):
@@ -216,23 +1428,14 @@ def normalize(probabilities):
     Update `probabilities` such that each probability distribution
     is normalized (i.e., sums to 1, with relative proportions the same).
     """
-    # raise NotImplementedError
-    # check
-    sum1 = probabilities["gene"][0] + probabilities["gene"][1] + probabilities["gene"][2]
-    if sum1 != 1.0:
-        ratio = 1/sum1
-        #scale each value by ratio
-        probabilities["gene"][0]*=ratio
-        probabilities["gene"][1]*=ratio
-        probabilities["gene"][2]*=ratio
-
-    sum2 = probabilities["trait"][0][True] + probabilities["trait"][0][False]
-
-    if sum2 != 1.0:
-        ratio2 = 1/sum2
-        #scale each value by ratio
-        probabilities["trait"][0][True]*=ratio2
-        probabilities["trait"][0][False]*=ratio2
+    for person in probabilities:
+        for field in probabilities[person]:
+            distribution = probabilities[person][field]
+            total = sum(distribution.values())
+            if total > 0:
+                for value in distribution:
+                    distribution[value] /= total
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,179 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+import pagerank
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+import benchmarking
+
+GRAPH_KINDS = ["random", "powerlaw", "dangling"]
+MEAN_LINKS = 8
+
+# Fields identifying a result record, with the format each is printed in
+COLUMNS = [("graph", ">9"), ("pages", ">8"), ("stage", "<28")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PageRank module on synthetic corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="number of pages in each generated corpus")
+    parser.add_argument("--graphs", nargs="+", choices=GRAPH_KINDS, default=GRAPH_KINDS,
+                        help="kinds of link graph to generate")
+    parser.add_argument("--samples", type=int, default=pagerank.SAMPLES * 100,
+                        help="samples drawn by sample_pagerank")
+    parser.add_argument("--tol", type=float, default=1e-8,
+                        help="l1 convergence tolerance for solve_pagerank")
+    parser.add_argument("--methods", nargs="+", choices=list(pagerank.SOLVERS),
+                        default=list(pagerank.SOLVERS),
+                        help="solve_pagerank methods to time")
+    parser.add_argument("--html", metavar="DIR",
+                        help="also write each corpus as HTML pages under DIR and time crawl()")
+    parser.add_argument("--legacy-limit", type=int, default=2000,
+                        help="largest corpus timed with the original dict engines")
+    benchmarking.add_report_arguments(parser)
+    args = parser.parse_args()
+
+    results = []
+    for kind in args.graphs:
+        for size in args.sizes:
+            rng = np.random.default_rng(args.seed)
+            corpus = generate_corpus(kind, size, rng)
+            directory = None
+            if args.html:
+                directory = os.path.join(args.html, f"{kind}-{size}")
+                write_html_corpus(corpus, directory)
+            for record in benchmark_corpus(corpus, directory, args):
+                record.update(graph=kind, pages=size)
+                results.append(record)
+                print(format_record(record))
+
+    report = {**benchmarking.run_details(numpy=np.__version__), "results": results}
+    benchmarking.write_report(args.output, report)
+
+    if args.compare:
+        benchmarking.compare_results(args.compare, results, COLUMNS)
+
+
+def generate_edges(kind, numPages, rng, meanLinks=MEAN_LINKS):
+    """
+    Return (src, dst) arrays of links for a synthetic corpus of `numPages`
+    pages. "random" gives every page `meanLinks` links to uniformly chosen
+    pages. "powerlaw" draws out-degrees from a Zipf distribution and picks
+    targets with probability proportional to 1 / (page + 1), so a few pages
+    attract most links. "dangling" is like "random" but half the pages have
+    no links at all.
+    """
+    if kind == "random" or kind == "dangling":
+        degree = np.full(numPages, meanLinks, dtype=np.int64)
+        if kind == "dangling":
+            degree[rng.random(numPages) < 0.5] = 0
+        src = np.repeat(np.arange(numPages), degree)
+        dst = rng.integers(numPages, size=len(src))
+    elif kind == "powerlaw":
+        degree = np.minimum(rng.zipf(2.0, size=numPages) * (meanLinks // 2), numPages - 1)
+        src = np.repeat(np.arange(numPages), degree)
+        popularity = np.cumsum(1 / np.arange(1, numPages + 1))
+        dst = np.searchsorted(popularity, rng.random(len(src)) * popularity[-1])
+        dst = rng.permutation(numPages)[np.minimum(dst, numPages - 1)]
+    else:
+        raise ValueError(f"Unknown graph kind: {kind}")
+
+    # crawl() never reports links from a page to itself
+    keep = src != dst
+    return src[keep], dst[keep]
+
+
+def generate_corpus(kind, numPages, rng, meanLinks=MEAN_LINKS):
+    """
+    Return a synthetic corpus dictionary of `numPages` pages named
+    0.html, 1.html, ... with links generated by generate_edges.
+    """
+    src, dst = generate_edges(kind, numPages, rng, meanLinks)
+    names = [f"{i}.html" for i in range(numPages)]
+    corpus = {name: set() for name in names}
+    for i, j in zip(src.tolist(), dst.tolist()):
+        corpus[names[i]].add(names[j])
+    return corpus
+
+
+def write_html_corpus(corpus, directory):
+    """
+    Write `corpus` to `directory` as one HTML file per page.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<!DOCTYPE html>\n<html>\n<head><title>{page}</title></head>\n<body>\n")
+            for link in sorted(links):
+                f.write(f'<a href="{link}">{link}</a>\n')
+            f.write("</body>\n</html>\n")
+
+
+def benchmark_corpus(corpus, directory, args):
+    """
+    Time each stage of the PageRank module on `corpus` and return a list
+    of result records, one per stage.
+    """
+    numPages = len(corpus)
+    stages = []
+    if directory is not None:
+        stages.append(("crawl", lambda: pagerank.crawl(directory)))
+
+    graph = pagerank.build_graph(corpus)
+    pages = list(corpus)
+    probe = pages[::max(1, numPages // 100)]
+
+    stages.append(("build_graph", lambda: pagerank.build_graph(corpus)))
+    stages.append(("transition_model", lambda: [
+        pagerank.transition_model(corpus, page, pagerank.DAMPING) for page in probe
+    ]))
+    stages.append(("sample_pagerank", lambda: pagerank.sample_pagerank(
+        graph, pagerank.DAMPING, args.samples, seed=args.seed
+    )))
+    for method in args.methods:
+        name = "solve_pagerank" if method == "jacobi" else f"solve_pagerank[{method}]"
+        stages.append((name, lambda method=method: pagerank.solve_pagerank(
+            graph, pagerank.DAMPING, tol=args.tol, norm="l1", method=method
+        )))
+    if numPages <= args.legacy_limit:
+        legacySamples = pagerank.SAMPLES
+        stages.append(("sample_pagerank[dict]", lambda: pagerank.sample_pagerank(
+            corpus, pagerank.DAMPING, legacySamples, seed=args.seed, engine="dict"
+        )))
+        stages.append(("iterate_pagerank[dict]", lambda: pagerank.iterate_pagerank(
+            corpus, pagerank.DAMPING, engine="dict"
+        )))
+
+    records = []
+    for name, stage in stages:
+        start = time.perf_counter()
+        outcome = stage()
+        record = {
+            "stage": name,
+            "seconds": time.perf_counter() - start,
+            "edges": len(graph.in_indices),
+        }
+        if name == "transition_model":
+            record["calls"] = len(probe)
+        if isinstance(outcome, pagerank.PageRankResult):
+            record["iterations"] = outcome.iterations
+            record["residual"] = outcome.residual
+        if not args.skip_memory:
+            record["peak_bytes"] = benchmarking.peak_memory(stage)
+        records.append(record)
+    return records
+
+
+def format_record(record):
+    line = benchmarking.format_record(record, COLUMNS)
+    if "iterations" in record:
+        line += f"  {record['iterations']} iterations"
+    return line
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,97 @@
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import mmap
 import os
 import random
 import re
 import sys
+import tempfile
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+import numpy as np
 
 DAMPING = 0.85
 SAMPLES = 10000
 EPSILON = .02
+TOLERANCE = 1e-8
+
+LINK_PATTERN = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+CRAWL_REPORT_EVERY = 10000
+CACHE_MAGIC = b"PRGRAPH1"
+GAUSS_SEIDEL_BLOCKS = 64
+EXTRAPOLATION_PERIOD = 10
+EDGES_MAGIC = b"PREDGES1"
+OUT_OF_CORE_BLOCK = 1 << 22
+
+# Integer-indexed link graph. pages[i] is the name of page i, out_degree[i]
+# the number of links on it, in_indices[in_indptr[i]:in_indptr[i + 1]]
+# the indices of the pages linking to page i and
+# out_indices[out_indptr[i]:out_indptr[i + 1]] the pages it links to
+# (compressed sparse row layout).
+LinkGraph = namedtuple("LinkGraph", [
+    "pages", "out_degree", "in_indptr", "in_indices", "out_indptr", "out_indices"
+])
+
+# Outcome of solve_pagerank: {page: rank} plus convergence statistics
+PageRankResult = namedtuple("PageRankResult", ["ranks", "iterations", "residual", "elapsed"])
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    parser = argparse.ArgumentParser(description="Compute PageRank for a corpus of HTML pages.")
+    parser.add_argument("corpus", nargs="?", help="directory of HTML pages")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of processes used for crawling and sampling (default: 1)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="report crawl progress on stderr")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="compiled link-graph file reused between runs")
+    parser.add_argument("--write-edges", metavar="FILE",
+                        help="also write the corpus, or the --edge-list, as a binary edge file for --edges")
+    parser.add_argument("--edges", metavar="FILE",
+                        help="rank a binary edge file out of core instead of a corpus")
+    parser.add_argument("--edge-list", metavar="FILE",
+                        help="text file of \"source target\" page numbers, one link per line, "
+                             "converted on disk to the --write-edges file and ranked out of core")
+    parser.add_argument("--top", type=int, default=20,
+                        help="number of pages printed with --edges (default: 20)")
+    parser.add_argument("--tol", type=float, default=TOLERANCE,
+                        help=f"convergence tolerance with --edges (default: {TOLERANCE:g})")
+    parser.add_argument("--norm", choices=["l1", "linf"], default="l1",
+                        help="norm of the change between iterations compared with --tol (default: l1)")
+    args = parser.parse_args()
+    if args.workers < 1:
+        sys.exit("--workers must be at least 1")
+    if [args.corpus, args.edges, args.edge_list].count(None) != 2:
+        sys.exit("Usage: python pagerank.py corpus | python pagerank.py --edges FILE | "
+                 "python pagerank.py --edge-list FILE --write-edges FILE")
+    if args.edge_list and not args.write_edges:
+        sys.exit("--edge-list needs --write-edges FILE to write the binary edge file to")
+
+    if args.edge_list:
+        write_edge_list(read_edge_list(args.edge_list), args.write_edges)
+        args.edges = args.write_edges
+    if args.edges:
+        result = out_of_core_pagerank(args.edges, DAMPING, args.tol, norm=args.norm)
+        print(f"PageRank Results from Out-of-Core Iteration ({result.iterations} iterations)")
+        top = np.argsort(result.ranks)[::-1][:args.top]
+        names = read_edge_names(args.edges, top)
+        for i in top.tolist():
+            print(f"  {names.get(i, i)}: {result.ranks[i]:.4f}")
+        return
+
+    if args.cache:
+        corpus = load_graph(args.corpus, args.cache, workers=args.workers, verbose=args.verbose)
+    else:
+        corpus = crawl(args.corpus, workers=args.workers, verbose=args.verbose)
+    if args.write_edges:
+        graph = corpus if isinstance(corpus, LinkGraph) else build_graph(corpus)
+        write_edge_file(graph, args.write_edges)
+    ranks = sample_pagerank(corpus, DAMPING, SAMPLES, workers=args.workers)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -21,32 +101,282 @@ def main():
         print(f"  {page}: {ranks[page]:.4f}")
 
 
-def crawl(directory):
+def crawl(directory, workers=1, verbose=False, cache=None):
     """
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
+
+    Files are memory-mapped rather than read into memory, and parsed on a
+    pool of `workers` processes. The page names are known from the
+    directory listing up front, so links are filtered as results arrive.
+    With `verbose`, progress in pages/sec is reported on stderr.
+
+    If `cache` names a graph file, only pages that changed since it was
+    written are parsed, and the file is brought up to date (see load_graph).
     """
-    pages = dict()
+    if cache is not None:
+        return graph_to_corpus(load_graph(directory, cache, workers, verbose))
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    start = time.perf_counter()
+    filenames = [
+        entry.name for entry in os.scandir(directory)
+        if entry.name.endswith(".html")
+    ]
+    names = set(filenames)
+    paths = [os.path.join(directory, filename) for filename in filenames]
+
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(workers)
+        results = pool.map(extract_links, paths, chunksize=64)
+    else:
+        results = map(extract_links, paths)
 
     # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
+    pages = dict()
+    try:
+        for filename, links in zip(filenames, results):
+            pages[filename] = set(
+                link for link in links
+                if link in names and link != filename
+            )
+            if verbose and len(pages) % CRAWL_REPORT_EVERY == 0:
+                report_crawl_rate(len(pages), start)
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
+    if verbose:
+        report_crawl_rate(len(pages), start)
     return pages
 
+def extract_links(path):
+    """
+    Return the set of href targets of the <a> tags in the file at `path`.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return set()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+            return set(
+                link.decode("utf-8", errors="replace")
+                for link in LINK_PATTERN.findall(contents)
+            )
+
+def report_crawl_rate(numPages, start):
+    elapsed = time.perf_counter() - start
+    rate = numPages / elapsed if elapsed > 0 else 0
+    print(f"Crawled {numPages} pages in {elapsed:.2f}s ({rate:.0f} pages/sec)", file=sys.stderr)
+
+def load_graph(directory, cache, workers=1, verbose=False):
+    """
+    Return the LinkGraph for a directory of HTML pages, using the compiled
+    graph file at `cache` to avoid parsing pages again.
+
+    A page is unchanged if its mtime and size match the cache, or, failing
+    that, if its SHA-1 digest does. When every page is unchanged the graph
+    arrays are memory-mapped straight from the cache file. Otherwise only
+    the changed pages are parsed, the graph is rebuilt and the cache file
+    rewritten.
+    """
+    start = time.perf_counter()
+    stats = {
+        entry.name: entry.stat() for entry in os.scandir(directory)
+        if entry.name.endswith(".html")
+    }
+    cached = read_graph_cache(cache) if os.path.exists(cache) else None
+
+    if cached is not None and len(cached.fingerprints) == len(stats) and all(
+        name in stats and
+        [stats[name].st_mtime_ns, stats[name].st_size] == fingerprint[:2]
+        for name, fingerprint in zip(cached.graph.pages, cached.fingerprints)
+    ):
+        if verbose:
+            print(f"Loaded {len(stats)} pages from {cache} in "
+                  f"{time.perf_counter() - start:.3f}s", file=sys.stderr)
+        return cached.graph
+
+    cachedRow = dict()
+    if cached is not None:
+        cachedRow = {name: i for i, name in enumerate(cached.graph.pages)}
+
+    # reuse the raw links of pages whose fingerprint still matches
+    rawLinks = dict()
+    fingerprints = dict()
+    toScan = []
+    for name, stat in stats.items():
+        i = cachedRow.get(name)
+        if i is not None and [stat.st_mtime_ns, stat.st_size] == cached.fingerprints[i][:2]:
+            rawLinks[name] = cached.links(i)
+            fingerprints[name] = cached.fingerprints[i]
+        else:
+            toScan.append(name)
+
+    paths = [os.path.join(directory, name) for name in toScan]
+    digests = [
+        cached.fingerprints[cachedRow[name]][2] if name in cachedRow else None
+        for name in toScan
+    ]
+    if workers > 1 and len(paths) > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            scanned = list(pool.map(scan_page, paths, digests, chunksize=64))
+    else:
+        scanned = list(map(scan_page, paths, digests))
+
+    numParsed = 0
+    for name, (digest, links) in zip(toScan, scanned):
+        if links is None:
+            links = cached.links(cachedRow[name])
+        else:
+            numParsed += 1
+        rawLinks[name] = links
+        fingerprints[name] = [stats[name].st_mtime_ns, stats[name].st_size, digest]
+
+    corpus = {
+        name: set(link for link in rawLinks[name] if link in stats and link != name)
+        for name in stats
+    }
+    graph = build_graph(corpus)
+    write_graph_cache(cache, graph, [fingerprints[name] for name in graph.pages],
+                      [rawLinks[name] for name in graph.pages])
+
+    if verbose:
+        print(f"Parsed {numParsed} of {len(stats)} pages, rebuilt {cache} in "
+              f"{time.perf_counter() - start:.3f}s", file=sys.stderr)
+    return graph
+
+def scan_page(path, knownDigest=None):
+    """
+    Return the SHA-1 digest of the file at `path` and the set of its links,
+    or None instead of the links if the digest equals `knownDigest`.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            digest = hashlib.sha1().hexdigest()
+            return digest, None if digest == knownDigest else set()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+            digest = hashlib.sha1(contents).hexdigest()
+            if digest == knownDigest:
+                return digest, None
+            return digest, set(
+                link.decode("utf-8", errors="replace")
+                for link in LINK_PATTERN.findall(contents)
+            )
+
+class GraphCache():
+    """
+    Contents of a compiled graph file: the LinkGraph, a [mtime_ns, size,
+    sha1] fingerprint per page, and every page's raw links (including
+    links to pages outside the corpus) as indices into a name table.
+    """
+
+    def __init__(self, graph, fingerprints, names, raw_indptr, raw_indices):
+        self.graph = graph
+        self.fingerprints = fingerprints
+        self.names = names
+        self.raw_indptr = raw_indptr
+        self.raw_indices = raw_indices
+
+    def links(self, i):
+        """
+        Return the raw links of page i as a set of names.
+        """
+        row = self.raw_indices[self.raw_indptr[i]:self.raw_indptr[i + 1]]
+        return set(self.names[j] for j in row.tolist())
+
+def write_graph_cache(path, graph, fingerprints, rawLinks):
+    """
+    Write `graph` to `path` as a compiled graph file: CACHE_MAGIC, the
+    length of a JSON header, the header (names, fingerprints and array
+    layout), then the CSR arrays, each aligned to 8 bytes so they can be
+    memory-mapped in place. `rawLinks` holds each page's unfiltered links.
+    """
+    names = list(graph.pages)
+    nameIndex = {name: i for i, name in enumerate(names)}
+    rawIndices = []
+    rawIndptr = np.zeros(len(names) + 1, dtype=np.int64)
+    for i, links in enumerate(rawLinks):
+        for link in links:
+            if link not in nameIndex:
+                nameIndex[link] = len(names)
+                names.append(link)
+            rawIndices.append(nameIndex[link])
+        rawIndptr[i + 1] = len(rawIndices)
+
+    arrays = {
+        "out_degree": np.asarray(graph.out_degree, dtype=np.int32),
+        "in_indptr": np.asarray(graph.in_indptr, dtype=np.int64),
+        "in_indices": np.asarray(graph.in_indices, dtype=np.int32),
+        "out_indptr": np.asarray(graph.out_indptr, dtype=np.int64),
+        "out_indices": np.asarray(graph.out_indices, dtype=np.int32),
+        "raw_indptr": rawIndptr,
+        "raw_indices": np.array(rawIndices, dtype=np.int32),
+    }
+
+    # lay the arrays out after the header, which is padded to 8 bytes
+    layout = dict()
+    offset = 0
+    for key, array in arrays.items():
+        layout[key] = [offset, array.dtype.str, len(array)]
+        offset += -(-array.nbytes // 8) * 8
+    header = json.dumps({
+        "numPages": len(graph.pages),
+        "names": names,
+        "fingerprints": fingerprints,
+        "arrays": layout,
+    }).encode("utf-8")
+    header += b" " * (-(len(CACHE_MAGIC) + 8 + len(header)) % 8)
+
+    tmpPath = path + ".tmp"
+    with open(tmpPath, "wb") as f:
+        f.write(CACHE_MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for array in arrays.values():
+            f.write(array.tobytes())
+            f.write(b"\0" * (-array.nbytes % 8))
+    os.replace(tmpPath, path)
+
+def read_graph_cache(path):
+    """
+    Memory-map the compiled graph file at `path` and return a GraphCache,
+    or None if the file is not a graph file.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+            return None
+        headerLength = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(headerLength))
+    base = len(CACHE_MAGIC) + 8 + headerLength
+
+    arrays = dict()
+    for key, (offset, dtype, length) in header["arrays"].items():
+        if length == 0:
+            arrays[key] = np.zeros(0, dtype=dtype)
+        else:
+            arrays[key] = np.memmap(path, dtype=dtype, mode="r",
+                                    offset=base + offset, shape=(length,))
+
+    numPages = header["numPages"]
+    names = header["names"]
+    graph = LinkGraph(
+        names[:numPages], arrays["out_degree"], arrays["in_indptr"],
+        arrays["in_indices"], arrays["out_indptr"], arrays["out_indices"]
+    )
+    return GraphCache(graph, header["fingerprints"], names,
+                      arrays["raw_indptr"], arrays["raw_indices"])
+
+def graph_to_corpus(graph):
+    """
+    Return the corpus dictionary {page: set(links)} described by `graph`.
+    """
+    return {
+        page: set(graph.pages[j] for j in
+                  graph.out_indices[graph.out_indptr[i]:graph.out_indptr[i + 1]].tolist())
+        for i, page in enumerate(graph.pages)
+    }
+
 def check_total_prob (probDist, msg, doPrint):
     totalProb = sum(probDist.values())
     if totalProb < 1 - EPSILON:
@@ -94,7 +424,7 @@ def transition_model(corpus, page, damping_factor):
     return probDist
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None, engine="batch", workers=1, chains=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -102,8 +432,31 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    `engine` selects the implementation: "batch" draws the surfer's
+    random choices in bulk NumPy batches over a LinkGraph, "dict" calls
+    transition_model on every step. Passing `seed` makes either engine
+    reproducible.
+
+    With the batch engine the `n` samples can be split over `chains`
+    independent surfers (default: one per worker), run across `workers`
+    processes. Each chain gets its own RNG stream spawned from `seed`, so
+    results depend on the seed and number of chains but not on `workers`.
     """
-    choiceLst = random.choices(list(corpus.keys()))
+    if engine == "batch":
+        graph = corpus if isinstance(corpus, LinkGraph) else build_graph(corpus)
+        if chains is None:
+            chains = workers
+        if chains == 1:
+            counts = batch_sample_counts(graph, damping_factor, n, np.random.default_rng(seed))
+        else:
+            counts = parallel_sample_counts(graph, damping_factor, n, seed, workers, chains)
+        return dict(zip(graph.pages, (counts / n).tolist()))
+    elif engine != "dict":
+        raise ValueError(f"Unknown sampling engine: {engine}")
+
+    rng = random.Random(seed)
+    choiceLst = rng.choices(list(corpus.keys()))
     page = choiceLst[0]
 
     estPRVals = dict.fromkeys(iter(corpus), 0)
@@ -111,7 +464,7 @@ def sample_pagerank(corpus, damping_factor, n):
     for i in range (n):
         pd = transition_model (corpus, page, damping_factor)
         # get new page value using transition model
-        choiceLst = random.choices(list(pd.keys()), list(pd.values()))
+        choiceLst = rng.choices(list(pd.keys()), list(pd.values()))
         page=choiceLst[0]
         estPRVals[page]+=1/n
 
@@ -120,6 +473,91 @@ def sample_pagerank(corpus, damping_factor, n):
 
     return estPRVals
 
+def batch_sample_counts(graph, damping_factor, n, rng, batchSize=1 << 20):
+    """
+    Follow one random surfer for `n` steps over `graph`, starting at a
+    random page, and return an integer array counting the visits to
+    each page.
+
+    Coin flips, teleport targets and link choices are drawn `batchSize`
+    steps at a time. Every teleport starts a new segment of the walk that
+    does not depend on where the surfer was, so within a batch all
+    segments are advanced together, one vectorized step per position.
+    """
+    numPages = len(graph.pages)
+    counts = np.zeros(numPages, dtype=np.int64)
+    page = rng.integers(numPages)
+
+    done = 0
+    while done < n:
+        size = min(batchSize, n - done)
+        follow = rng.random(size) < damping_factor
+        jumps = rng.integers(numPages, size=size)
+        picks = rng.random(size)
+
+        # path[0] is where the surfer stands, path[k + 1] the page after step k
+        path = np.empty(size + 1, dtype=np.int64)
+        path[0] = page
+        teleports = np.flatnonzero(~follow) + 1
+        path[teleports] = jumps[teleports - 1]
+
+        # each segment starts at a known page and runs up to the next teleport
+        position = np.concatenate(([0], teleports))
+        end = np.append(teleports - 1, size)
+        current = path[position]
+        while len(position) > 0:
+            walking = position < end
+            position = position[walking] + 1
+            end = end[walking]
+            current = current[walking]
+
+            step = position - 1
+            degree = graph.out_degree[current]
+            # pages without links behave as if they linked to every page
+            nextPage = jumps[step]
+            linked = np.flatnonzero(degree > 0)
+            choice = np.minimum((picks[step[linked]] * degree[linked]).astype(np.int64),
+                                degree[linked] - 1)
+            nextPage[linked] = graph.out_indices[graph.out_indptr[current[linked]] + choice]
+
+            path[position] = nextPage
+            current = nextPage
+
+        counts += np.bincount(path[1:], minlength=numPages)
+        page = path[size]
+        done += size
+
+    return counts
+
+def parallel_sample_counts(graph, damping_factor, n, seed, workers, chains):
+    """
+    Split `n` samples over `chains` independent surfers run on a pool of
+    `workers` processes, and return the summed integer visit counts.
+    """
+    streams = np.random.SeedSequence(seed).spawn(chains)
+    lengths = [n // chains + (1 if i < n % chains else 0) for i in range(chains)]
+
+    counts = np.zeros(len(graph.pages), dtype=np.int64)
+    if workers == 1:
+        for length, stream in zip(lengths, streams):
+            counts += batch_sample_counts(graph, damping_factor, length, np.random.default_rng(stream))
+        return counts
+
+    # ship the graph to each worker once rather than with every chain
+    with ProcessPoolExecutor(workers, initializer=_set_worker_graph, initargs=(graph,)) as pool:
+        for chainCounts in pool.map(_sample_chain, [damping_factor] * chains, lengths, streams):
+            counts += chainCounts
+    return counts
+
+_workerGraph = None
+
+def _set_worker_graph(graph):
+    global _workerGraph
+    _workerGraph = graph
+
+def _sample_chain(damping_factor, n, stream):
+    return batch_sample_counts(_workerGraph, damping_factor, n, np.random.default_rng(stream))
+
 def thresholdMet(currentPageRank, newPageRank,convThreshold):
 
     cdIter = iter(currentPageRank)
@@ -130,13 +568,6 @@ def thresholdMet(currentPageRank, newPageRank,convThreshold):
             return False
 
     return True
-def getNumLinksOnPage (corpus, i):
-    numLinks = 0
-    corpIter = iter(corpus)
-    for corpKey in corpIter:
-        linksTo = corpus.get(i)
-    return len(linksTo)
-
 def getPagesLinkingTo (corpus, keyToRank):
     linkingToSet = set()
     corpIter = iter(corpus)
@@ -148,26 +579,730 @@ def getPagesLinkingTo (corpus, keyToRank):
     return linkingToSet
 
 def PR(convThreshold, currentPageRank, corpus, damping_factor):
+    """
+    Repeat the PageRank update over the corpus dictionary until
+    thresholdMet, alternating between two rank dictionaries instead
+    of recursing once per iteration. A page with no links into the
+    corpus is treated as linking to every page, so its rank is spread
+    evenly over all of them, as in power_step.
+    """
     numKeys=len(corpus)
-    newPageRank = dict.fromkeys(iter(corpus), (1-damping_factor)/numKeys)
-   
-    corpIter = iter(corpus)
-    for corpKey in corpIter:
-        linkingToSet = getPagesLinkingTo (corpus, corpKey)
+    linkingTo = {corpKey: getPagesLinkingTo(corpus, corpKey) for corpKey in corpus}
+    numLinks = {corpKey: sum(link in corpus for link in corpus[corpKey]) for corpKey in corpus}
+    dangling = [corpKey for corpKey in corpus if numLinks[corpKey] == 0]
+    newPageRank = dict.fromkeys(iter(corpus), 0)
+
+    while True:
+        danglingRank = sum(currentPageRank[corpKey] for corpKey in dangling)
+        for corpKey in corpus:
+            rank = (1-damping_factor)/numKeys + damping_factor*danglingRank/numKeys
+            for linkPage in linkingTo[corpKey]:
+                rank += damping_factor*currentPageRank[linkPage]/numLinks[linkPage]
+            newPageRank[corpKey] = rank
+
+        if thresholdMet (currentPageRank, newPageRank,convThreshold):
+            return newPageRank
+        currentPageRank, newPageRank = newPageRank, currentPageRank
+
+def build_graph(corpus):
+    """
+    Compile `corpus` into a LinkGraph, numbering pages in corpus order.
+    Links to pages outside the corpus are ignored.
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    numPages = len(pages)
+
+    out_degree = np.zeros(numPages, dtype=np.int32)
+    src = []
+    dst = []
+    for i, page in enumerate(pages):
+        links = [index[link] for link in corpus[page] if link in index]
+        out_degree[i] = len(links)
+        src.extend([i] * len(links))
+        dst.extend(links)
+    src = np.array(src, dtype=np.int32)
+    dst = np.array(dst, dtype=np.int32)
+
+    # group edges by target page so each page's inbound links are contiguous
+    order = np.argsort(dst, kind="stable")
+    in_indices = src[order]
+    in_indptr = np.zeros(numPages + 1, dtype=np.int64)
+    np.cumsum(np.bincount(dst, minlength=numPages), out=in_indptr[1:])
+
+    # edges were generated page by page, so they are already grouped by source
+    out_indptr = np.zeros(numPages + 1, dtype=np.int64)
+    np.cumsum(out_degree, out=out_indptr[1:])
+
+    return LinkGraph(pages, out_degree, in_indptr, in_indices, out_indptr, dst)
+
+
+def solve_pagerank(corpus, damping=DAMPING, tol=TOLERANCE, max_iter=1000, norm="l1", initial=None,
+                   teleport=None, method="jacobi"):
+    """
+    Run power iteration over `corpus` (a corpus dictionary or a LinkGraph)
+    until the change between iterations, measured with the "l1" or
+    "linf" norm, is at most `tol`, or `max_iter` iterations have run.
+    Pages without links spread their rank evenly over every page.
+
+    The default stops on the total change over all pages, which means
+    the same however many pages there are. A per-page "linf" threshold
+    like the dict engine's .001 is met after a few iterations on a large
+    corpus, when every rank is already far below it.
+
+    Iteration starts from the uniform distribution, or from the
+    {page: rank} dictionary `initial` if given (see starting_ranks).
+
+    `teleport` is an optional {page: weight} dictionary used instead of
+    the uniform distribution both for random jumps and for the rank of
+    pages without links, giving personalized PageRank.
+
+    `method` picks the iteration scheme, one of SOLVERS:
+        "jacobi": plain power iteration
+        "gauss-seidel": block Gauss-Seidel sweeps that update ranks in place
+        "extrapolate": power iteration with periodic quadratic extrapolation
+
+    Return a PageRankResult holding the {page: rank} dictionary, the number
+    of iterations run, the final residual and the elapsed time in seconds.
+    """
+    if norm not in ("l1", "linf"):
+        raise ValueError(f"Unknown norm: {norm}")
+    if method not in SOLVERS:
+        raise ValueError(f"Unknown solver method: {method}")
+    start = time.perf_counter()
+    graph = corpus if isinstance(corpus, LinkGraph) else build_graph(corpus)
+
+    teleportVector = None
+    if teleport is not None:
+        teleportVector = teleport_vector(graph, teleport)
+
+    ranks, iterations, residual = SOLVERS[method](
+        graph, starting_ranks(graph, initial), damping, tol, max_iter, norm, teleportVector
+    )
+
+    return PageRankResult(
+        dict(zip(graph.pages, ranks.tolist())),
+        iterations,
+        residual,
+        time.perf_counter() - start
+    )
+
+def power_step(graph, damping, teleportVector=None):
+    """
+    Return a function step(ranks, out) that writes one power-iteration
+    update of the rank vector `ranks` over `graph` into `out`, reusing
+    the same scratch buffers on every call.
+    """
+    numPages = len(graph.pages)
+    isDangling = (graph.out_degree == 0).astype(np.float64)
+    invDegree = np.divide(1, graph.out_degree, out=np.zeros(numPages),
+                          where=graph.out_degree > 0)
+    hasInbound = np.flatnonzero(np.diff(graph.in_indptr))
+    segmentStarts = graph.in_indptr[hasInbound]
+
+    share = np.empty(numPages)
+    edgeShare = np.empty(len(graph.in_indices))
+    inflow = np.empty(len(hasInbound))
+
+    def step(ranks, out):
+        np.multiply(ranks, invDegree, out=share)
+        out.fill(0)
+        if len(edgeShare) > 0:
+            np.take(share, graph.in_indices, out=edgeShare)
+            np.add.reduceat(edgeShare, segmentStarts, out=inflow)
+            np.put(out, hasInbound, inflow)
+        out *= damping
+        jumpMass = 1 - damping + damping * np.dot(ranks, isDangling)
+        if teleportVector is None:
+            out += jumpMass / numPages
+        else:
+            np.multiply(teleportVector, jumpMass, out=share)
+            out += share
+
+    return step
+
+def change_norm(change, norm):
+    """
+    Return the "l1" or "linf" norm of the absolute changes in `change`.
+    """
+    return float(change.sum() if norm == "l1" else change.max())
+
+def jacobi_solve(graph, ranks, damping, tol, max_iter, norm, teleportVector):
+    """
+    Plain power iteration, alternating between two rank buffers.
+    Return the ranks, the number of iterations and the final residual.
+    """
+    step = power_step(graph, damping, teleportVector)
+    newRanks = np.empty(len(ranks))
+    change = np.empty(len(ranks))
+
+    iterations = 0
+    residual = float("inf")
+    while iterations < max_iter and residual > tol:
+        step(ranks, newRanks)
+        np.subtract(newRanks, ranks, out=change)
+        np.abs(change, out=change)
+        residual = change_norm(change, norm)
+        ranks, newRanks = newRanks, ranks
+        iterations += 1
+
+    return ranks, iterations, residual
+
+def gauss_seidel_solve(graph, ranks, damping, tol, max_iter, norm, teleportVector):
+    """
+    Block Gauss-Seidel: pages are split into GAUSS_SEIDEL_BLOCKS ranges
+    of consecutive indices, and each range is updated in place from the
+    latest ranks, including those already updated earlier in the sweep.
+    Return the ranks, the number of sweeps and the final residual.
+    """
+    numPages = len(graph.pages)
+    dangling = graph.out_degree == 0
+    invDegree = np.divide(1, graph.out_degree, out=np.zeros(numPages),
+                          where=graph.out_degree > 0)
+    if teleportVector is None:
+        teleportVector = np.full(numPages, 1 / numPages)
+
+    # per block: its page range, the sources of its inbound links and
+    # the position within the block each link points to
+    bounds = np.linspace(0, numPages, min(GAUSS_SEIDEL_BLOCKS, numPages) + 1).astype(np.int64)
+    blocks = []
+    for first, last in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        rows = graph.in_indptr[first:last + 1]
+        sources = graph.in_indices[rows[0]:rows[-1]]
+        targets = np.repeat(np.arange(last - first), np.diff(rows))
+        blocks.append((first, last, sources, targets))
+
+    previous = np.empty(numPages)
+    iterations = 0
+    residual = float("inf")
+    while iterations < max_iter and residual > tol:
+        previous[:] = ranks
+        share = ranks * invDegree
+        danglingMass = ranks[dangling].sum()
+        for first, last, sources, targets in blocks:
+            inflow = np.bincount(targets, weights=share[sources], minlength=last - first)
+            block = damping * inflow
+            block += (1 - damping + damping * danglingMass) * teleportVector[first:last]
+            danglingMass += (block - ranks[first:last])[dangling[first:last]].sum()
+            ranks[first:last] = block
+            share[first:last] = block * invDegree[first:last]
+        ranks /= ranks.sum()
+
+        residual = change_norm(np.abs(ranks - previous), norm)
+        iterations += 1
+
+    return ranks, iterations, residual
+
+def extrapolated_solve(graph, ranks, damping, tol, max_iter, norm, teleportVector):
+    """
+    Power iteration with quadratic extrapolation (Kamvar et al.): every
+    EXTRAPOLATION_PERIOD iterations the last four iterates are used to
+    cancel the two largest non-principal eigenvector components. An
+    extrapolation that would give a negative rank is skipped.
+    Return the ranks, the number of iterations and the final residual.
+    """
+    step = power_step(graph, damping, teleportVector)
+    history = deque(maxlen=4)
+
+    iterations = 0
+    residual = float("inf")
+    while iterations < max_iter and residual > tol:
+        newRanks = np.empty(len(ranks))
+        step(ranks, newRanks)
+        residual = change_norm(np.abs(newRanks - ranks), norm)
+        ranks = newRanks
+        history.append(ranks)
+        iterations += 1
+
+        if residual > tol and len(history) == 4 and iterations % EXTRAPOLATION_PERIOD == 0:
+            extrapolated = quadratic_extrapolation(*history)
+            if extrapolated is not None:
+                ranks = extrapolated
+                history.clear()
+                history.append(ranks)
+
+    return ranks, iterations, residual
+
+def quadratic_extrapolation(x0, x1, x2, x3):
+    """
+    Return the quadratic extrapolation of the successive iterates x0..x3,
+    normalized to sum to 1, or None if it is not a valid distribution.
+    """
+    y = np.column_stack((x1 - x0, x2 - x0))
+    gamma, *_ = np.linalg.lstsq(y, -(x3 - x0), rcond=None)
+    beta0 = gamma[0] + gamma[1] + 1
+    beta1 = gamma[1] + 1
+    extrapolated = beta0 * x1 + beta1 * x2 + x3
+    total = extrapolated.sum()
+    if not np.isfinite(total) or total <= 0 or (extrapolated < 0).any():
+        return None
+    return extrapolated / total
+
+SOLVERS = {
+    "jacobi": jacobi_solve,
+    "gauss-seidel": gauss_seidel_solve,
+    "extrapolate": extrapolated_solve,
+}
+
+def starting_ranks(graph, initial=None):
+    """
+    Return the rank vector iteration over `graph` starts from: uniform if
+    `initial` is None, otherwise the {page: rank} values in `initial`,
+    with pages missing from it given 1 / N, rescaled to sum to 1.
+    """
+    numPages = len(graph.pages)
+    if initial is None:
+        return np.full(numPages, 1 / numPages)
+    ranks = np.fromiter(
+        (initial.get(page, 1 / numPages) for page in graph.pages),
+        dtype=np.float64, count=numPages
+    )
+    return ranks / ranks.sum()
+
+def teleport_vector(graph, teleport):
+    """
+    Return the {page: weight} dictionary `teleport` as a probability
+    vector indexed like graph.pages.
+    """
+    index = {page: i for i, page in enumerate(graph.pages)}
+    vector = np.zeros(len(graph.pages))
+    for page, weight in teleport.items():
+        vector[index[page]] += weight
+    if vector.sum() <= 0:
+        raise ValueError("Teleport weights must have a positive sum")
+    return vector / vector.sum()
+
+def personalized_pagerank(corpus, teleport, damping=DAMPING, epsilon=1e-4):
+    """
+    Approximate personalized PageRank for the {page: weight} dictionary
+    `teleport` by forward push, without touching the rest of the corpus.
 
-        if (len(linkingToSet) > 0):
-            for linkPage in linkingToSet:
-                numLinks = getNumLinksOnPage(corpus, linkPage)
-                newPageRank[corpKey] += damping_factor*currentPageRank[linkPage]/numLinks
+    Every page holds an estimate and a residual. The residual starts as
+    the teleport distribution; a page whose residual exceeds `epsilon`
+    times its number of links keeps a (1 - damping) share of it and
+    passes the rest on evenly to the pages it links to. Pages without
+    links pass it back to the teleport distribution. The work done is
+    O(1 / (epsilon * (1 - damping))) whatever the size of the corpus.
+
+    `corpus` may be a corpus dictionary or a LinkGraph. Return a
+    dictionary of the estimated ranks of the pages reached.
+    """
+    if isinstance(corpus, LinkGraph):
+        index = {page: i for i, page in enumerate(corpus.pages)}
+        def links(page):
+            i = index[page]
+            row = corpus.out_indices[corpus.out_indptr[i]:corpus.out_indptr[i + 1]]
+            return [corpus.pages[j] for j in row.tolist()]
+        def degree(page):
+            return int(corpus.out_degree[index[page]])
+    else:
+        def links(page):
+            return corpus[page]
+        def degree(page):
+            return len(corpus[page])
+
+    total = sum(teleport.values())
+    if total <= 0:
+        raise ValueError("Teleport weights must have a positive sum")
+    seeds = {page: weight / total for page, weight in teleport.items() if weight > 0}
+
+    estimate = dict()
+    residual = dict(seeds)
+    queue = deque(residual)
+    queued = set(residual)
+    while queue:
+        page = queue.popleft()
+        queued.discard(page)
+        pageLinks = links(page)
+        amount = residual.pop(page)
+        estimate[page] = estimate.get(page, 0) + (1 - damping) * amount
+
+        # pages without links send the surfer back to the teleport pages
+        if pageLinks:
+            targets = [(target, 1 / len(pageLinks)) for target in pageLinks]
         else:
-            newPageRank[corpKey] += damping_factor*currentPageRank[linkPage]/numKeys
+            targets = seeds.items()
+        for target, weight in targets:
+            residual[target] = residual.get(target, 0) + damping * amount * weight
+            if target not in queued and residual[target] > epsilon * max(degree(target), 1):
+                queued.add(target)
+                queue.append(target)
+
+    return estimate
+
+def top_k(ranks, k):
+    """
+    Return the `k` highest-ranked (page, rank) pairs of the {page: rank}
+    dictionary `ranks`, highest first, using a bounded heap.
+    """
+    return heapq.nlargest(k, ranks.items(), key=itemgetter(1))
+
+# Change to a corpus: `added_pages` maps new (or rewritten) pages to their
+# links, `removed_pages` is a set of pages, and `added_links` and
+# `removed_links` are sets of (page, target) pairs. Fields left out are
+# empty; `added_pages` defaults to None, meaning no pages.
+CorpusDelta = namedtuple(
+    "CorpusDelta", ["added_pages", "removed_pages", "added_links", "removed_links"],
+    defaults=(None, frozenset(), frozenset(), frozenset())
+)
+
+# Outcome of update_pagerank
+IncrementalResult = namedtuple("IncrementalResult", ["corpus", "result", "iterations_saved"])
+
+def apply_delta(corpus, delta):
+    """
+    Return a new corpus dictionary with the CorpusDelta `delta` applied.
+    Links pointing at removed pages are dropped; `corpus` is not modified.
+    Link sets are copied only for pages that change.
+    """
+    updated = dict(corpus)
+    for page in delta.removed_pages:
+        updated.pop(page, None)
+    for page, links in (delta.added_pages or {}).items():
+        updated[page] = set(links)
+    for page, target in delta.added_links:
+        if page in updated:
+            updated[page] = updated[page] | {target}
+    for page, target in delta.removed_links:
+        if page in updated:
+            updated[page] = updated[page] - {target}
+
+    removed = set(delta.removed_pages)
+    if removed:
+        for page, links in updated.items():
+            if not removed.isdisjoint(links):
+                updated[page] = links - removed
+    return updated
 
-    if False == thresholdMet (currentPageRank, newPageRank,convThreshold):
-        return PR (convThreshold, newPageRank, corpus, damping_factor)
+def update_pagerank(corpus, previous, delta, damping=DAMPING, tol=TOLERANCE, max_iter=1000,
+                    norm="l1", method="warm"):
+    """
+    Refresh the PageRankResult `previous`, computed for `corpus`, after
+    the CorpusDelta `delta` is applied, by restarting power iteration
+    from the previous ranks ("warm").
+
+    "push" is kept for comparison and is not faster in general: it
+    computes every page's residual once and then pushes residual from
+    single pages (see push_pagerank), counting the full sweeps its
+    edge updates add up to. It needs fewer sweeps than a fresh solve
+    only when the change stays local, as on graphs where many pages
+    have no links; on well-connected graphs a few changed links move
+    every rank by more than a tight tolerance and it needs more, and
+    its per-page loop is slower than "warm" either way. Pushing stops
+    once it has done as many sweeps as `previous` took, and power
+    iteration finishes from where it got to.
+
+    Return an IncrementalResult with the new corpus, the new PageRankResult
+    and the iterations saved relative to `previous`, which is assumed to
+    have been solved from scratch with the same tolerance.
+    """
+    updated = apply_delta(corpus, delta)
+    if method == "warm":
+        result = solve_pagerank(updated, damping, tol, max_iter, norm, initial=previous.ranks)
+    elif method == "push":
+        graph = build_graph(updated)
+        result = push_pagerank(graph, previous.ranks, damping, tol, previous.iterations, norm)
+        if result.residual > tol:
+            finish = solve_pagerank(graph, damping, tol, max_iter, norm, initial=result.ranks)
+            result = PageRankResult(
+                finish.ranks,
+                result.iterations + finish.iterations,
+                finish.residual,
+                result.elapsed + finish.elapsed
+            )
+    else:
+        raise ValueError(f"Unknown update method: {method}")
+    return IncrementalResult(updated, result, previous.iterations - result.iterations)
+
+def push_pagerank(graph, initial, damping, tol, max_sweeps=None, norm="l1"):
+    """
+    Correct the {page: rank} estimate `initial` for `graph` by pushing
+    residual rank from pages to the pages they link to.
+
+    Rank spread by pages without links adds the same to every page, so
+    it only scales the solution. Pushing therefore solves the system in
+    which those pages keep their rank, with the random-jump share most
+    pages already satisfy, and rescales the result to sum to 1. That
+    keeps the residual near the pages that changed instead of handing
+    it to every page.
+
+    A page is pushed while its residual exceeds `tol` ("linf") or
+    `tol` / N ("l1"), until no such page is left or the edge updates
+    add up to more than `max_sweeps` full sweeps. Return a
+    PageRankResult whose residual, measured with `norm`, exceeds `tol`
+    if pushing was stopped early; its iterations count the sweep that
+    computes the residuals as well.
+    """
+    start = time.perf_counter()
+    numPages = len(graph.pages)
+    numEdges = max(len(graph.in_indices), 1)
+    ranks = starting_ranks(graph, initial)
+
+    # residual = what one step of the scaled system would add to each page
+    invDegree = np.divide(1, graph.out_degree, out=np.zeros(numPages),
+                          where=graph.out_degree > 0)
+    targets = np.repeat(np.arange(numPages), np.diff(graph.in_indptr))
+    inflow = np.bincount(targets, weights=(ranks * invDegree)[graph.in_indices],
+                         minlength=numPages)
+    jump = float(np.median(ranks - damping * inflow))
+    residual = jump + damping * inflow - ranks
+    threshold = tol / numPages if norm == "l1" else tol
+
+    out_degree = graph.out_degree.tolist()
+    out_indptr = graph.out_indptr.tolist()
+    out_indices = graph.out_indices
+    residual = residual.tolist()
+    ranks = ranks.tolist()
+    queued = [abs(r) > threshold for r in residual]
+    queue = deque(i for i, flag in enumerate(queued) if flag)
+
+    edgeWork = 0
+    maxWork = None if max_sweeps is None else max_sweeps * numEdges
+    while queue and (maxWork is None or edgeWork <= maxWork):
+        page = queue.popleft()
+        queued[page] = False
+        amount = residual[page]
+        ranks[page] += amount
+        residual[page] = 0
+        if out_degree[page] == 0:
+            continue
+        share = damping * amount / out_degree[page]
+        for target in out_indices[out_indptr[page]:out_indptr[page + 1]].tolist():
+            residual[target] += share
+            if not queued[target] and abs(residual[target]) > threshold:
+                queued[target] = True
+                queue.append(target)
+        edgeWork += out_degree[page]
+
+    total = sum(ranks)
+    change = np.abs(residual) / total
+    return PageRankResult(
+        dict(zip(graph.pages, (r / total for r in ranks))),
+        1 + -(-edgeWork // numEdges),
+        change_norm(change, norm) if numPages > 0 else 0,
+        time.perf_counter() - start
+    )
+
+def write_edge_file(graph, path, blockEdges=OUT_OF_CORE_BLOCK):
+    """
+    Write `graph` to `path` as a binary edge file for out_of_core_pagerank:
+    EDGES_MAGIC, the numbers of pages and links as little-endian uint64,
+    the int32 out-degree of every page padded to 8 bytes, then one int32
+    (source, target) pair per link, sorted by target. Page names are
+    written one per line to `path` + ".names".
+
+    `graph` is held in memory; write_edge_list writes the same format
+    from a link list too large for that.
+    """
+    numPages = len(graph.pages)
+    numEdges = len(graph.in_indices)
+    with open(path, "wb") as f:
+        f.write(EDGES_MAGIC)
+        f.write(numPages.to_bytes(8, "little"))
+        f.write(numEdges.to_bytes(8, "little"))
+        degrees = np.asarray(graph.out_degree, dtype="<i4")
+        f.write(degrees.tobytes())
+        f.write(b"\0" * (-degrees.nbytes % 8))
+
+        # walk the inbound CSR arrays a block of links at a time
+        for first in range(0, numEdges, blockEdges):
+            last = min(first + blockEdges, numEdges)
+            pairs = np.empty((last - first, 2), dtype="<i4")
+            pairs[:, 0] = graph.in_indices[first:last]
+            pairs[:, 1] = np.searchsorted(graph.in_indptr, np.arange(first, last), side="right") - 1
+            f.write(pairs.tobytes())
+
+    with open(path + ".names", "w") as f:
+        for page in graph.pages:
+            f.write(page + "\n")
+
+def read_edge_list(path, blockEdges=OUT_OF_CORE_BLOCK):
+    """
+    Yield (sources, targets) arrays of at most `blockEdges` links read
+    from the text file at `path`, which holds one "source target" pair of
+    page numbers per line. Lines starting with "#" are skipped.
+    """
+    with open(path) as f:
+        while True:
+            lines = list(itertools.islice(f, blockEdges))
+            if not lines:
+                return
+            block = np.loadtxt(lines, dtype=np.int64, comments="#", ndmin=2)
+            if len(block) > 0:
+                yield block[:, 0], block[:, 1]
+
+def write_edge_list(blocks, path, blockEdges=OUT_OF_CORE_BLOCK):
+    """
+    Write a binary edge file like write_edge_file to `path` from `blocks`,
+    an iterable of (sources, targets) arrays of page numbers such as
+    read_edge_list yields, without holding every link in memory.
+
+    Each block is sorted by target into a temporary run file next to
+    `path`, and the runs are then merged `blockEdges` links at a time.
+    Only the out-degree vector is kept whole. Pages are numbered 0 to
+    the highest number seen, and no names file is written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    degrees = np.zeros(0, dtype=np.int64)
+    runs = []
+    try:
+        for sources, targets in blocks:
+            if len(sources) == 0:
+                continue
+            counts = np.bincount(sources)
+            if len(counts) > len(degrees):
+                degrees = np.concatenate((degrees, np.zeros(len(counts) - len(degrees), dtype=np.int64)))
+            degrees[:len(counts)] += counts
+            order = np.argsort(targets, kind="stable")
+            pairs = np.column_stack((sources[order], targets[order])).astype("<i4")
+            handle, runPath = tempfile.mkstemp(suffix=".run", dir=directory)
+            with os.fdopen(handle, "wb") as f:
+                f.write(pairs.tobytes())
+            runs.append((runPath, len(pairs)))
+            highest = int(targets[order[-1]])
+            if highest >= len(degrees):
+                degrees = np.concatenate((degrees, np.zeros(highest + 1 - len(degrees), dtype=np.int64)))
+
+        numPages = len(degrees)
+        numEdges = sum(length for _, length in runs)
+        with open(path, "wb") as f:
+            f.write(EDGES_MAGIC)
+            f.write(numPages.to_bytes(8, "little"))
+            f.write(numEdges.to_bytes(8, "little"))
+            degrees = degrees.astype("<i4")
+            f.write(degrees.tobytes())
+            f.write(b"\0" * (-degrees.nbytes % 8))
+            merge_runs(runs, f, blockEdges)
+    finally:
+        for runPath, _ in runs:
+            os.remove(runPath)
+
+def merge_runs(runs, f, blockEdges):
+    """
+    Merge the (path, number of links) run files in `runs`, each a list
+    of int32 (source, target) pairs sorted by target, into the open file
+    `f`, reading each run a slice at a time.
+    """
+    chunk = max(blockEdges // max(len(runs), 1), 1)
+    readers = [np.memmap(runPath, dtype="<i4", mode="r", shape=(length, 2)) for runPath, length in runs]
+    positions = [0] * len(runs)
+    buffers = [np.zeros((0, 2), dtype="<i4")] * len(runs)
+    while True:
+        # top each buffer up to `chunk` links from its run
+        for i, reader in enumerate(readers):
+            wanted = chunk - len(buffers[i])
+            if wanted > 0 and positions[i] < len(reader):
+                taken = np.asarray(reader[positions[i]:positions[i] + wanted])
+                buffers[i] = np.concatenate((buffers[i], taken))
+                positions[i] += len(taken)
+        if all(len(buffer) == 0 for buffer in buffers):
+            return
+
+        # links up to the lowest last target of a run with more to read
+        # cannot be preceded by anything still on disk
+        pending = [int(buffer[-1, 1]) for buffer, reader, position
+                   in zip(buffers, readers, positions) if position < len(reader)]
+        cutoff = min(pending) if pending else None
+        ready = []
+        for i, buffer in enumerate(buffers):
+            split = len(buffer) if cutoff is None else np.searchsorted(buffer[:, 1], cutoff, side="right")
+            ready.append(buffer[:split])
+            buffers[i] = buffer[split:]
+        ready = np.concatenate(ready)
+        f.write(ready[np.argsort(ready[:, 1], kind="stable")].tobytes())
+
+def open_edge_file(path):
+    """
+    Memory-map the binary edge file at `path` and return its out-degree
+    vector and its (number of links x 2) array of (source, target) pairs.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(EDGES_MAGIC)) != EDGES_MAGIC:
+            raise ValueError(f"{path} is not a PageRank edge file")
+        numPages = int.from_bytes(f.read(8), "little")
+        numEdges = int.from_bytes(f.read(8), "little")
+    base = len(EDGES_MAGIC) + 16
+    degrees = np.memmap(path, dtype="<i4", mode="r", offset=base, shape=(numPages,))
+    edgeOffset = base + numPages * 4 + (-numPages * 4 % 8)
+    if numEdges == 0:
+        edges = np.zeros((0, 2), dtype="<i4")
     else:
-        return newPageRank
+        edges = np.memmap(path, dtype="<i4", mode="r", offset=edgeOffset, shape=(numEdges, 2))
+    return degrees, edges
+
+def read_edge_names(path, ids):
+    """
+    Return {id: name} for the page ids in `ids`, read from the names file
+    written next to the edge file at `path`, or {} if there is none.
+    """
+    wanted = set(int(i) for i in ids)
+    names = dict()
+    if not os.path.exists(path + ".names"):
+        return names
+    with open(path + ".names") as f:
+        for i, line in enumerate(f):
+            if i in wanted:
+                names[i] = line.rstrip("\n")
+                if len(names) == len(wanted):
+                    break
+    return names
+
+def out_of_core_pagerank(path, damping=DAMPING, tol=TOLERANCE, max_iter=1000, norm="l1",
+                         blockEdges=OUT_OF_CORE_BLOCK):
+    """
+    Run power iteration over the memory-mapped binary edge file at `path`,
+    streaming it `blockEdges` links at a time on every iteration. Only the
+    current and next rank vectors stay in memory, so graphs with more
+    links than fit in RAM can be ranked.
 
-def iterate_pagerank(corpus, damping_factor):
+    Stops like solve_pagerank and returns a PageRankResult, except that
+    `ranks` is an array indexed by page id (the line number of the page
+    in the ".names" file written by write_edge_file).
+    """
+    if norm not in ("l1", "linf"):
+        raise ValueError(f"Unknown norm: {norm}")
+    start = time.perf_counter()
+    degrees, edges = open_edge_file(path)
+    numPages = len(degrees)
+    numEdges = len(edges)
+
+    ranks = np.full(numPages, 1 / numPages)
+    newRanks = np.empty(numPages)
+
+    iterations = 0
+    residual = float("inf")
+    while iterations < max_iter and residual > tol:
+        danglingMass = 0
+        for first in range(0, numPages, blockEdges):
+            last = min(first + blockEdges, numPages)
+            danglingMass += ranks[first:last][degrees[first:last] == 0].sum()
+
+        # links are sorted by target, so each block adds into one slice
+        newRanks.fill(0)
+        for first in range(0, numEdges, blockEdges):
+            block = np.asarray(edges[first:first + blockEdges])
+            sources = block[:, 0]
+            targets = block[:, 1]
+            lowest = int(targets[0])
+            highest = int(targets[-1])
+            newRanks[lowest:highest + 1] += np.bincount(
+                targets - lowest, weights=ranks[sources] / degrees[sources],
+                minlength=highest - lowest + 1
+            )
+        newRanks *= damping
+        newRanks += (1 - damping + damping * danglingMass) / numPages
+
+        residual = 0
+        for first in range(0, numPages, blockEdges):
+            change = np.abs(newRanks[first:first + blockEdges] - ranks[first:first + blockEdges])
+            residual = residual + change.sum() if norm == "l1" else max(residual, change.max())
+        residual = float(residual)
+        ranks, newRanks = newRanks, ranks
+        iterations += 1
+
+    return PageRankResult(ranks, iterations, residual, time.perf_counter() - start)
+
+def iterate_pagerank(corpus, damping_factor, engine="csr", method="jacobi"):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -175,14 +1310,26 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    `engine` selects the implementation: "csr" compiles the corpus into
+    integer arrays once and runs vectorized power iteration, "dict"
+    is the original pure-Python update over the corpus dictionary.
+    With the csr engine, `method` picks the solver and convergence is
+    judged as in solve_pagerank; the dict engine keeps the original
+    per-page threshold.
     """
+    if engine == "csr":
+        return solve_pagerank(corpus, damping_factor, method=method).ranks
+    elif engine != "dict":
+        raise ValueError(f"Unknown PageRank engine: {engine}")
+
+    convThreshold = .001
+
     numKeys=len(corpus)
 
     # initial guess based on random surfing alone
     estPRVals = dict.fromkeys(iter(corpus), 1/numKeys)
 
-    convThreshold = .001
-
     estPRVals = PR(convThreshold,estPRVals, corpus,damping_factor)
 
     addsToOne, weight = check_total_prob (estPRVals, "Iteration", False)